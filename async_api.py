@@ -0,0 +1,82 @@
+# async_api.py
+# asyncio front end for the unit registry. Errors are raised as the typed
+# exceptions from conversion.py (UnknownUnit, IncompatibleCategory) instead
+# of the (None, message) tuples returned by convert_units.
+import asyncio
+from functools import partial
+
+import numpy as np
+
+from conversion import REGISTRY
+
+# Batches at least this large are converted in an executor, chunk by chunk,
+# so the event loop is never blocked and cancellation lands between chunks
+OFFLOAD_THRESHOLD = 10_000
+CHUNK_SIZE = 65_536
+
+_DONE = object()
+
+
+async def convert(value, from_unit, to_unit):
+    return REGISTRY.convert(value, from_unit, to_unit)
+
+
+async def convert_batch(values, from_unit, to_unit, executor=None):
+    # Resolve the pair up front so bad units fail in the caller's task
+    REGISTRY.affine(from_unit, to_unit)
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    if values.size < OFFLOAD_THRESHOLD:
+        return REGISTRY.convert_array(values, from_unit, to_unit)
+
+    loop = asyncio.get_running_loop()
+    out = np.empty_like(values)
+    flat_values = values.reshape(-1)
+    flat_out = out.reshape(-1)
+    for start in range(0, flat_values.size, CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        await loop.run_in_executor(executor, partial(
+            REGISTRY.convert_array, flat_values[chunk], from_unit, to_unit,
+            out=flat_out[chunk]
+        ))
+    return out
+
+
+async def _iterate(batches):
+    if hasattr(batches, "__aiter__"):
+        async for batch in batches:
+            yield batch
+    else:
+        for batch in batches:
+            yield batch
+
+
+async def convert_stream(batches, from_unit, to_unit, max_pending=4, executor=None):
+    """Convert batches from a (sync or async) iterable, yielding results in order.
+
+    At most `max_pending` unconverted batches are buffered; a producer that
+    gets further ahead than that is suspended until the consumer catches up.
+    Closing or cancelling the consumer cancels the producer too.
+    """
+    REGISTRY.affine(from_unit, to_unit)
+    queue = asyncio.Queue(maxsize=max_pending)
+
+    async def produce():
+        try:
+            async for batch in _iterate(batches):
+                await queue.put((batch, None))
+        except Exception as e:
+            await queue.put((None, e))
+        else:
+            await queue.put((_DONE, None))
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            batch, error = await queue.get()
+            if error is not None:
+                raise error
+            if batch is _DONE:
+                break
+            yield await convert_batch(batch, from_unit, to_unit, executor)
+    finally:
+        producer.cancel()
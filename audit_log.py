@@ -0,0 +1,393 @@
+# audit_log.py
+# Append-only audit log of conversions: timestamp, unit IDs, value, result
+# and the (scale, offset) used, as fixed-width 48-byte binary records.
+# Records are buffered in memory and written in groups by a background
+# thread, with an fsync at most once per FSYNC_INTERVAL (and at exit), so
+# logging a conversion costs one struct.pack.
+#
+# Each process writes its own file. The header holds the unit-name table the
+# IDs refer to, so old logs stay readable after units are added. A sidecar
+# ".idx" file keeps a sparse index: per block of BLOCK_RECORDS records the
+# first and last timestamp and a 64-bit mask of the unit pairs in it, so a
+# query only touches the blocks that can match.
+#
+# The directory is set with UNIT_CONVERTER_AUDIT_LOG (default: audit/ next
+# to the app, "off" disables logging). Query it with:
+#
+#     python audit_log.py query [--pair Meter:Foot] [--since 2026-10-01] [--until ...] [--count]
+#     python audit_log.py bench [--records 10000000]
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from conversion import REGISTRY
+
+AUDIT_ENV_VAR = "UNIT_CONVERTER_AUDIT_LOG"
+AUDIT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit")
+SUFFIX = ".ucaudit"
+
+FLUSH_INTERVAL = 0.2
+FSYNC_INTERVAL = 1.0
+BLOCK_RECORDS = 4096
+
+AUDIT_MAGIC = b"UCAUDIT\0"
+AUDIT_VERSION = 1
+# magic, version, record size, metadata length (JSON unit names, padded to 8)
+_HEADER = struct.Struct("<8sIIQ")
+_RECORD = struct.Struct("<qHH4xdddd")
+_INDEX = struct.Struct("<qqQ")
+
+logger = logging.getLogger(__name__)
+
+RECORD_DTYPE = np.dtype({
+    "names": ["timestamp", "from_id", "to_id", "value", "result", "scale", "offset"],
+    "formats": ["<i8", "<u2", "<u2", "<f8", "<f8", "<f8", "<f8"],
+    "offsets": [0, 8, 10, 16, 24, 32, 40],
+    "itemsize": _RECORD.size,
+})
+INDEX_DTYPE = np.dtype([("first", "<i8"), ("last", "<i8"), ("pairs", "<u8")])
+FRAME_COLUMNS = ["timestamp", "from_unit", "to_unit", "value", "result", "scale", "offset"]
+
+
+def pair_bit(from_id, to_id):
+    return 1 << ((from_id * 31 + to_id) % 64)
+
+
+def _write_all(file, data):
+    """Write to an unbuffered file; returns (bytes written, OSError or None)."""
+    view = memoryview(data)
+    done = 0
+    while done < len(view):
+        try:
+            done += file.write(view[done:])
+        except OSError as e:
+            return done, e
+    return done, None
+
+
+class AuditLog:
+    def __init__(self, directory, registry=REGISTRY):
+        self.registry = registry
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        self.path = os.path.join(directory, f"audit-{stamp}-{os.getpid()}{SUFFIX}")
+        metadata = json.dumps({"units": registry.unit_names}, separators=(",", ":")).encode()
+        metadata += b" " * (-(_HEADER.size + len(metadata)) % 8)
+        # Unbuffered: records are buffered here, and a failed write must leave
+        # no bytes behind in a file object buffer to be written twice
+        self._file = open(self.path, "ab", buffering=0)
+        try:
+            self._file.write(_HEADER.pack(AUDIT_MAGIC, AUDIT_VERSION, _RECORD.size, len(metadata)))
+            self._file.write(metadata)
+            self._index = open(self.path + ".idx", "ab", buffering=0)
+        except OSError:
+            self._file.close()
+            raise
+        self._buffer = bytearray()
+        self._index_buffer = bytearray()
+        self._records = 0
+        self._last_timestamp = 0
+        self._block_first = None
+        self._block_pairs = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, True)
+
+    def _timestamp(self):
+        # Non-decreasing within a file, so the index ranges stay sorted
+        now = max(time.time_ns(), self._last_timestamp)
+        self._last_timestamp = now
+        return now
+
+    def _count(self, timestamp, bit, count):
+        while count:
+            if self._block_first is None:
+                self._block_first = timestamp
+            take = min(BLOCK_RECORDS - self._records % BLOCK_RECORDS, count)
+            self._records += take
+            count -= take
+            self._block_pairs |= bit
+            if self._records % BLOCK_RECORDS == 0:
+                self._index_buffer += _INDEX.pack(self._block_first, timestamp, self._block_pairs)
+                self._block_first = None
+                self._block_pairs = 0
+
+    def record(self, value, from_unit, to_unit, result):
+        scale, offset = self.registry.affine(from_unit, to_unit)
+        f = self.registry.unit_ids[from_unit]
+        t = self.registry.unit_ids[to_unit]
+        with self._lock:
+            timestamp = self._timestamp()
+            self._buffer += _RECORD.pack(timestamp, f, t, value, result, scale, offset)
+            self._count(timestamp, pair_bit(f, t), 1)
+
+    def record_many(self, values, from_unit, to_unit, results):
+        """Log a whole batch converted with one unit pair."""
+        scale, offset = self.registry.affine(from_unit, to_unit)
+        f = self.registry.unit_ids[from_unit]
+        t = self.registry.unit_ids[to_unit]
+        records = np.zeros(np.size(values), dtype=RECORD_DTYPE)
+        records["from_id"] = f
+        records["to_id"] = t
+        records["value"] = np.ravel(values)
+        records["result"] = np.ravel(results)
+        records["scale"] = scale
+        records["offset"] = offset
+        with self._lock:
+            timestamp = self._timestamp()
+            records["timestamp"] = timestamp
+            self._buffer += records.tobytes()
+            self._count(timestamp, pair_bit(f, t), len(records))
+
+    def flush(self, fsync=False):
+        with self._write_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+                index, self._index_buffer = self._index_buffer, bytearray()
+            written, error = _write_all(self._file, data)
+            index_written = 0
+            if error is None:
+                # Index entries only ever describe data that is already written
+                index_written, error = _write_all(self._index, index)
+            if error is not None:
+                # Whatever didn't reach the files goes back ahead of newer records
+                with self._lock:
+                    self._buffer[:0] = data[written:]
+                    self._index_buffer[:0] = index[index_written:]
+                raise error
+            if fsync:
+                os.fsync(self._file.fileno())
+                os.fsync(self._index.fileno())
+                self._last_fsync = time.monotonic()
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush(time.monotonic() - self._last_fsync >= FSYNC_INTERVAL)
+            except OSError:
+                # flush() kept the unwritten records; the next one retries them
+                pass
+
+
+class AuditReader:
+    """Memory-mapped view of one audit file and its sparse index."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, record_size, metadata_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != AUDIT_MAGIC or version != AUDIT_VERSION or record_size != _RECORD.size:
+                raise ValueError(f"{path} is not a version {AUDIT_VERSION} audit log")
+            self.units = json.loads(f.read(metadata_size))["units"]
+        self.unit_ids = {unit: i for i, unit in enumerate(self.units)}
+        data_offset = _HEADER.size + metadata_size
+        # A torn record at the end (crash mid-write) is ignored
+        count = (os.path.getsize(path) - data_offset) // _RECORD.size
+        if count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r",
+                                     offset=data_offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        try:
+            index = np.fromfile(path + ".idx", dtype=INDEX_DTYPE)
+        except OSError:
+            index = np.zeros(0, dtype=INDEX_DTYPE)
+        self.index = index[:count // BLOCK_RECORDS]
+
+    def __len__(self):
+        return len(self.records)
+
+    def _candidate_ranges(self, from_id, to_id, start, end):
+        index = self.index
+        keep = np.ones(len(index), dtype=bool)
+        if start is not None:
+            keep &= index["last"] >= start
+        if end is not None:
+            keep &= index["first"] <= end
+        if from_id is not None and to_id is not None:
+            keep &= (index["pairs"] & np.uint64(pair_bit(from_id, to_id))) != 0
+        # Runs of consecutive candidate blocks become one slice each
+        blocks = np.flatnonzero(keep)
+        ranges = []
+        if len(blocks):
+            breaks = np.flatnonzero(np.diff(blocks) != 1) + 1
+            for run in np.split(blocks, breaks):
+                ranges.append((run[0] * BLOCK_RECORDS, (run[-1] + 1) * BLOCK_RECORDS))
+        # Records past the last full block are not indexed yet
+        tail = len(index) * BLOCK_RECORDS
+        if tail < len(self.records):
+            ranges.append((tail, len(self.records)))
+        return ranges
+
+    def query(self, from_unit=None, to_unit=None, start=None, end=None):
+        """Matching records as a structured array; start/end are ns timestamps."""
+        from_id = self.unit_ids.get(from_unit, -1) if from_unit is not None else None
+        to_id = self.unit_ids.get(to_unit, -1) if to_unit is not None else None
+        if -1 in (from_id, to_id):
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        parts = []
+        for first, last in self._candidate_ranges(from_id, to_id, start, end):
+            chunk = self.records[first:last]
+            match = np.ones(len(chunk), dtype=bool)
+            if from_id is not None:
+                match &= chunk["from_id"] == from_id
+            if to_id is not None:
+                match &= chunk["to_id"] == to_id
+            if start is not None:
+                match &= chunk["timestamp"] >= start
+            if end is not None:
+                match &= chunk["timestamp"] <= end
+            parts.append(chunk[match])
+        if not parts:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts)
+
+    def to_frame(self, records):
+        units = np.array(self.units, dtype=object)
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(records["timestamp"], unit="ns"),
+            "from_unit": units[records["from_id"]],
+            "to_unit": units[records["to_id"]],
+            "value": records["value"],
+            "result": records["result"],
+            "scale": records["scale"],
+            "offset": records["offset"],
+        })
+
+
+def log_files(directory):
+    return sorted(glob.glob(os.path.join(directory, f"*{SUFFIX}")))
+
+
+def query(directory, from_unit=None, to_unit=None, start=None, end=None):
+    """Query every audit file in a directory; returns a DataFrame."""
+    start = None if start is None else pd.Timestamp(start).value
+    end = None if end is None else pd.Timestamp(end).value
+    frames = []
+    for path in log_files(directory):
+        reader = AuditReader(path)
+        records = reader.query(from_unit, to_unit, start, end)
+        if len(records):
+            frames.append(reader.to_frame(records))
+    if not frames:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+_log = None
+_log_failed = False
+_log_lock = threading.Lock()
+
+
+def get_audit_log():
+    """The process-wide audit log, or None when UNIT_CONVERTER_AUDIT_LOG is
+    "off" or the log can't be opened."""
+    global _log, _log_failed
+    directory = os.environ.get(AUDIT_ENV_VAR, AUDIT_DIR)
+    if directory in ("", "off"):
+        return None
+    with _log_lock:
+        if _log is None and not _log_failed:
+            try:
+                _log = AuditLog(directory)
+            except OSError as e:
+                # A read-only deployment still converts; it just isn't audited.
+                # Warn once instead of failing (and retrying) every conversion
+                _log_failed = True
+                logger.warning("Audit log disabled: cannot write to %s: %s", directory, e)
+        return _log
+
+
+def benchmark(records=10_000_000):
+    # Common pairs in rotation, plus one rare pair once every 1000 batches
+    rare = ("Ounce", "Gram")
+    pairs = [(a, b) for a in REGISTRY.unit_names for b in REGISTRY.unit_names
+             if REGISTRY.unit_category[a] == REGISTRY.unit_category[b] and a != b and (a, b) != rare]
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        log = AuditLog(directory)
+        started = time.perf_counter()
+        for _ in range(100_000):
+            log.record(1.0, "Meter", "Foot", 3.28)
+        single = (time.perf_counter() - started) / 100_000
+
+        batch = 1000
+        values = rng.uniform(0, 100, batch)
+        started = time.perf_counter()
+        for i in range(records // batch):
+            from_unit, to_unit = rare if i % 1000 == 999 else pairs[i % len(pairs)]
+            log.record_many(values, from_unit, to_unit, values)
+        log.flush(fsync=True)
+        written = time.perf_counter() - started
+        size = os.path.getsize(log.path)
+
+        reader = AuditReader(log.path)
+        middle = int(reader.records["timestamp"][len(reader) // 2])
+        timings = {}
+        for name, args in (("pair Meter->Foot", ("Meter", "Foot", None, None)),
+                           ("rare pair Ounce->Gram", ("Ounce", "Gram", None, None)),
+                           ("1 ms time window", (None, None, middle, middle + 1_000_000))):
+            started = time.perf_counter()
+            found = len(reader.query(*args))
+            timings[name] = (time.perf_counter() - started, found)
+        full_index, reader.index = reader.index, reader.index[:0]
+        started = time.perf_counter()
+        reader.query(None, None, middle, middle + 1_000_000)
+        unindexed = time.perf_counter() - started
+        reader.index = full_index
+
+    total = len(reader)
+    print(f"record(): {single * 1e6:.2f} us per conversion")
+    print(f"record_many(): {total / written / 1e6:.1f}M records/s including fsync, "
+          f"{size / total:.0f} bytes/record, {size / 1e6:.0f} MB")
+    for name, (seconds, found) in timings.items():
+        print(f"query {name:<24} {seconds * 1000:8.1f} ms  {found:,} matches")
+    print(f"query 1 ms window, no index    {unindexed * 1000:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the conversion audit log")
+    commands = parser.add_subparsers(dest="command", required=True)
+    search = commands.add_parser("query")
+    search.add_argument("--dir", default=os.environ.get(AUDIT_ENV_VAR, AUDIT_DIR))
+    search.add_argument("--pair", help="from:to, either side may be empty")
+    search.add_argument("--since", help="start time, e.g. 2026-10-01 or 2026-10-01T12:00")
+    search.add_argument("--until", help="end time (inclusive)")
+    search.add_argument("--count", action="store_true", help="print the number of matches only")
+    search.add_argument("--limit", type=int, default=50, help="rows to print (0 for all)")
+    bench = commands.add_parser("bench")
+    bench.add_argument("--records", type=int, default=10_000_000)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        benchmark(args.records)
+        return 0
+    from_unit = to_unit = None
+    if args.pair:
+        from_unit, _, to_unit = args.pair.partition(":")
+        from_unit, to_unit = from_unit or None, to_unit or None
+    frame = query(args.dir, from_unit, to_unit, args.since, args.until)
+    if args.count:
+        print(len(frame))
+    else:
+        print(frame.to_string(max_rows=args.limit or None, index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# auto_units.py
+# Picks the most readable unit for a value: the largest unit of the same
+# measurement system in which the value is still at least 1. Each category
+# and system gets a precomputed ladder of log10 unit sizes, so a lookup is one
+# binary search and whole columns are handled with a single np.searchsorted.
+from functools import lru_cache
+
+import numpy as np
+
+from conversion import REGISTRY
+
+UNIT_SYSTEMS = {
+    "Meter": "metric", "Centimeter": "metric", "Kilometer": "metric",
+    "Kilogram": "metric", "Gram": "metric",
+    "Inch": "imperial", "Foot": "imperial",
+    "Pound": "imperial", "Ounce": "imperial"
+}
+
+# Imperial units that read better as "<whole> <major> <rest> <minor>"
+MIXED_UNITS = {"Foot": "Inch", "Pound": "Ounce"}
+UNIT_SYMBOLS = {"Foot": "ft", "Inch": "in", "Pound": "lb", "Ounce": "oz"}
+
+# Absorbs rounding in values that land exactly on a unit boundary (1000 m)
+_EPSILON = 1e-9
+
+
+@lru_cache(maxsize=None)
+def _ladder(category, system):
+    units = [
+        unit for unit in REGISTRY.unit_names
+        if REGISTRY.unit_category[unit] == category and UNIT_SYSTEMS.get(unit) == system
+    ]
+    ids = np.array([REGISTRY.unit_id(unit) for unit in units], dtype=np.intp)
+    sizes = REGISTRY.scales[ids]
+    order = np.argsort(sizes)
+    return np.array(units)[order], sizes[order], np.log10(sizes[order])
+
+
+def best_units(values, from_unit):
+    """Return (converted values, unit name per value) using the readable unit."""
+    values = np.asarray(values, dtype=np.float64)
+    category = REGISTRY.category_of(from_unit)
+    system = UNIT_SYSTEMS.get(from_unit)
+    if system is None:
+        # Temperature and other offset scales have no "bigger" unit to move to
+        return values.copy(), np.full(values.shape, from_unit)
+    names, sizes, log_sizes = _ladder(category, system)
+    base = values * REGISTRY.scales[REGISTRY.unit_id(from_unit)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logs = np.log10(np.abs(base)) + _EPSILON
+    index = np.searchsorted(log_sizes, logs, side="right") - 1
+    np.clip(index, 0, len(names) - 1, out=index)
+    # Zeros, NaN and infinities stay in the unit they came in
+    stay = ~np.isfinite(logs)
+    if stay.any():
+        index[stay] = int(np.flatnonzero(names == from_unit)[0])
+    return base / sizes[index], names[index]
+
+
+def best_unit(value, from_unit):
+    values, units = best_units([value], from_unit)
+    return float(values[0]), str(units[0])
+
+
+def split_mixed(values, unit, precision=0):
+    """Split values in a MIXED_UNITS major unit into (whole, remainder) arrays,
+    the remainder expressed in the minor unit and rounded to `precision`."""
+    minor = MIXED_UNITS[unit]
+    ratio, _ = REGISTRY.affine(unit, minor)
+    values = np.asarray(values, dtype=np.float64)
+    sign = np.sign(values)
+    magnitude = np.abs(values)
+    whole = np.floor(magnitude)
+    rest = np.round((magnitude - whole) * ratio, precision)
+    # 5 ft 12 in rounds up to 6 ft 0 in
+    carry = rest >= np.round(ratio, precision)
+    whole = np.where(carry, whole + 1, whole)
+    rest = np.where(carry, 0.0, rest)
+    return sign * whole, sign * rest
+
+
+def mixed_units(value, unit, precision=0):
+    """Format a value as e.g. "5 ft 11 in", or None if the unit has no mixed form."""
+    if unit not in MIXED_UNITS:
+        return None
+    whole, rest = split_mixed([value], unit, precision)
+    minor = MIXED_UNITS[unit]
+    rest_text = f"{abs(rest[0]):.{precision}f}"
+    sign = "-" if value < 0 else ""
+    return f"{sign}{abs(whole[0]):.0f} {UNIT_SYMBOLS[unit]} {rest_text} {UNIT_SYMBOLS[minor]}"
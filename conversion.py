@@ -0,0 +1,543 @@
+# conversion.py
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from collections import namedtuple
+from fractions import Fraction
+
+import numpy as np
+
+import kernels
+from metrics import CONVERSION_ERRORS, record_conversion
+
+# Conversion factors
+CONVERSION_FACTORS = {
+    "Length": {
+        "Meter": 1,
+        "Centimeter": 100,
+        "Kilometer": 0.001,
+        "Inch": 1 / 0.0254,
+        "Foot": 1 / 0.3048
+    },
+    "Temperature": ["Celsius", "Fahrenheit", "Kelvin"],
+    "Weight": {
+        "Kilogram": 1,
+        "Gram": 1000,
+        "Pound": 1 / 0.45359237,
+        "Ounce": 16 / 0.45359237
+    }
+}
+
+# Short and alternative spellings accepted wherever users type unit names
+UNIT_ALIASES = {
+    "m": "Meter", "meter": "Meter", "meters": "Meter", "metre": "Meter", "metres": "Meter",
+    "cm": "Centimeter", "centimeter": "Centimeter", "centimeters": "Centimeter",
+    "km": "Kilometer", "kilometer": "Kilometer", "kilometers": "Kilometer",
+    "in": "Inch", "inch": "Inch", "inches": "Inch", '"': "Inch",
+    "ft": "Foot", "foot": "Foot", "feet": "Foot", "'": "Foot",
+    "c": "Celsius", "°c": "Celsius", "degc": "Celsius", "celsius": "Celsius",
+    "f": "Fahrenheit", "°f": "Fahrenheit", "degf": "Fahrenheit", "fahrenheit": "Fahrenheit",
+    "k": "Kelvin", "kelvin": "Kelvin",
+    "kg": "Kilogram", "kilogram": "Kilogram", "kilograms": "Kilogram",
+    "g": "Gram", "gram": "Gram", "grams": "Gram",
+    "lb": "Pound", "lbs": "Pound", "pound": "Pound", "pounds": "Pound",
+    "oz": "Ounce", "ounce": "Ounce", "ounces": "Ounce"
+}
+
+
+def resolve_unit(name):
+    """Map a typed unit name or alias to its registry name."""
+    unit = UNIT_ALIASES.get(name.strip().lower())
+    if unit is None:
+        raise UnknownUnit(name)
+    return unit
+
+
+# Compiled registry snapshot. Set UNIT_CONVERTER_REGISTRY_CACHE to another
+# path, or to "off" to always compile from CONVERSION_FACTORS.
+REGISTRY_CACHE_ENV_VAR = "UNIT_CONVERTER_REGISTRY_CACHE"
+REGISTRY_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "registry.bin")
+
+# Temperature units as (scale, offset) so that celsius = value * scale + offset
+TEMPERATURE_SCALES = {
+    "Celsius": (1.0, 0.0),
+    "Fahrenheit": (5 / 9, -32 * 5 / 9),
+    "Kelvin": (1.0, -273.15)
+}
+
+# Exact definitions as (scale, offset) into the base unit, used by the exact
+# Fraction path that the float paths are checked against
+EXACT_UNITS = {
+    "Meter": ("1", "0"),
+    "Centimeter": ("1/100", "0"),
+    "Kilometer": ("1000", "0"),
+    "Inch": ("0.0254", "0"),
+    "Foot": ("0.3048", "0"),
+    "Celsius": ("1", "0"),
+    "Fahrenheit": ("5/9", "-160/9"),
+    "Kelvin": ("1", "-273.15"),
+    "Kilogram": ("1", "0"),
+    "Gram": ("1/1000", "0"),
+    "Pound": ("0.45359237", "0"),
+    "Ounce": ("0.028349523125", "0")
+}
+
+# Unit roundoff of float32 with a little headroom for second-order terms;
+# see UnitRegistry.float32_error_bound
+FLOAT32_ROUNDING = 2.0 ** -24 * 1.001
+
+# Smallest physically possible value per category, in the category's base
+# unit (Meter, Celsius, Kilogram): no negative lengths or masses, nothing
+# below absolute zero
+CATEGORY_LOWER_BOUNDS = {
+    "Length": 0.0,
+    "Temperature": -273.15,
+    "Weight": 0.0
+}
+
+
+# A value with a one-sigma uncertainty, and a closed [low, high] interval
+Measurement = namedtuple("Measurement", ["value", "sigma"])
+Interval = namedtuple("Interval", ["low", "high"])
+
+
+class ConversionError(Exception):
+    pass
+
+
+class UnknownUnit(ConversionError, KeyError):
+    def __init__(self, unit):
+        super().__init__(f"Unknown unit: {unit}")
+        self.unit = unit
+
+    def __str__(self):
+        return self.args[0]
+
+
+class IncompatibleCategory(ConversionError, ValueError):
+    def __init__(self, from_unit, from_category, to_unit, to_category):
+        super().__init__(
+            f"Cannot convert {from_unit} ({from_category}) "
+            f"to {to_unit} ({to_category})"
+        )
+        self.from_unit = from_unit
+        self.from_category = from_category
+        self.to_unit = to_unit
+        self.to_category = to_category
+
+
+class OutOfRange(ConversionError, ValueError):
+    def __init__(self, unit, report, value=None, minimum=None):
+        if value is not None:
+            # A single value reads better than an index report
+            reason = f"below the physical minimum of {minimum:g} {unit}" if len(report.below) else "not a finite number"
+            super().__init__(f"{value:g} {unit} is {reason}")
+            self.unit = unit
+            self.report = report
+            return
+        problems = []
+        for label, indices in (("NaN", report.nan), ("infinite", report.infinite),
+                               ("below the physical minimum", report.below)):
+            if len(indices):
+                shown = ", ".join(map(str, indices[:5])) + (", ..." if len(indices) > 5 else "")
+                problems.append(f"{len(indices)} {label} (index {shown})")
+        super().__init__(f"Invalid {unit} values: " + "; ".join(problems))
+        self.unit = unit
+        self.report = report
+
+
+class PrecisionLoss(ConversionError, ArithmeticError):
+    pass
+
+
+# Offending indices found by UnitRegistry.validate
+ValidationReport = namedtuple("ValidationReport", ["nan", "infinite", "below"])
+
+
+def convert_units(value, from_unit, to_unit, category):
+    start = time.perf_counter()
+    try:
+        if from_unit == to_unit:
+            return value, "No conversion needed"
+
+        if category == "Temperature":
+            converters = {
+                ("Celsius", "Fahrenheit"): lambda x: (x * 9/5) + 32,
+                ("Fahrenheit", "Celsius"): lambda x: (x - 32) * 5/9,
+                ("Celsius", "Kelvin"): lambda x: x + 273.15,
+                ("Kelvin", "Celsius"): lambda x: x - 273.15,
+                ("Fahrenheit", "Kelvin"): lambda x: (x - 32) * 5/9 + 273.15,
+                ("Kelvin", "Fahrenheit"): lambda x: (x - 273.15) * 9/5 + 32
+            }
+            return converters[(from_unit, to_unit)](value), "Converted"
+        else:
+            factor = (CONVERSION_FACTORS[category][to_unit]
+                     / CONVERSION_FACTORS[category][from_unit])
+            return value * factor, f"{value} × {factor:.4f}"
+    except Exception as e:
+        CONVERSION_ERRORS.inc(category)
+        return None, str(e)
+    finally:
+        record_conversion(category, from_unit, to_unit, time.perf_counter() - start)
+
+
+def convert_exact(value, from_unit, to_unit):
+    """Convert with exact rational arithmetic; returns a Fraction."""
+    for unit in (from_unit, to_unit):
+        if unit not in EXACT_UNITS:
+            raise UnknownUnit(unit)
+    from_scale, from_offset = map(Fraction, EXACT_UNITS[from_unit])
+    to_scale, to_offset = map(Fraction, EXACT_UNITS[to_unit])
+    base = Fraction(value) * from_scale + from_offset
+    return (base - to_offset) / to_scale
+
+
+class UnitRegistry:
+    """Compiled form of CONVERSION_FACTORS: every unit gets an integer ID and
+    an affine (scale, offset) transform into its category's base unit."""
+
+    def __init__(self, categories, unit_names, unit_categories, scales, offsets):
+        self.categories = tuple(categories)
+        self.unit_names = list(unit_names)
+        self.unit_ids = {unit: i for i, unit in enumerate(self.unit_names)}
+        self.unit_category = dict(zip(self.unit_names, unit_categories))
+        self.scales = np.asarray(scales, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.float64)
+        self._pairs = {}
+        self._pairs32 = {}
+        # Widget options, built once: unit names and IDs per category, and
+        # each unit's position within its category
+        self.category_units = {category: [] for category in self.categories}
+        for unit in self.unit_names:
+            self.category_units[self.unit_category[unit]].append(unit)
+        self.category_units = {
+            category: tuple(units) for category, units in self.category_units.items()
+        }
+        self.category_ids = {
+            category: tuple(self.unit_ids[unit] for unit in units)
+            for category, units in self.category_units.items()
+        }
+        self.unit_index = {
+            unit: index
+            for units in self.category_units.values()
+            for index, unit in enumerate(units)
+        }
+        # Per category, the unit every other one is defined against (Meter,
+        # Celsius, Kilogram): its transform is the identity
+        self.base_units = {}
+        for unit, scale, offset in zip(self.unit_names, self.scales, self.offsets):
+            if scale == 1.0 and offset == 0.0:
+                self.base_units.setdefault(self.unit_category[unit], unit)
+        # Category number per unit ID, for checking whole arrays of pairs
+        category_numbers = {category: i for i, category in enumerate(self.categories)}
+        self.category_codes = np.array(
+            [category_numbers[self.unit_category[unit]] for unit in self.unit_names], dtype=np.intp
+        )
+        # Per-unit minimum, in the unit itself (-459.67 for Fahrenheit), with
+        # a little slack so the bound itself survives the rounding
+        base_bounds = np.array(
+            [CATEGORY_LOWER_BOUNDS.get(self.unit_category[unit], -np.inf) for unit in self.unit_names]
+        )
+        lower_bounds = (base_bounds - self.offsets) / self.scales
+        self.lower_bounds = lower_bounds - 1e-9 * np.maximum(np.abs(lower_bounds), 1.0)
+
+    @classmethod
+    def compile(cls, factors):
+        unit_names = []
+        unit_categories = []
+        scales = []
+        offsets = []
+        for category, units in factors.items():
+            for unit in units:
+                if category == "Temperature":
+                    scale, offset = TEMPERATURE_SCALES[unit]
+                else:
+                    scale, offset = 1 / units[unit], 0.0
+                unit_names.append(unit)
+                unit_categories.append(category)
+                scales.append(scale)
+                offsets.append(offset)
+        return cls(factors, unit_names, unit_categories, scales, offsets)
+
+    def unit_id(self, unit):
+        try:
+            return self.unit_ids[unit]
+        except KeyError:
+            raise UnknownUnit(unit) from None
+
+    def category_of(self, unit):
+        self.unit_id(unit)
+        return self.unit_category[unit]
+
+    def affine(self, from_unit, to_unit):
+        """Return (scale, offset) so that converted = value * scale + offset."""
+        pair = (from_unit, to_unit)
+        cached = self._pairs.get(pair)
+        if cached is not None:
+            return cached
+        f = self.unit_id(from_unit)
+        t = self.unit_id(to_unit)
+        if self.unit_category[from_unit] != self.unit_category[to_unit]:
+            raise IncompatibleCategory(
+                from_unit, self.unit_category[from_unit],
+                to_unit, self.unit_category[to_unit]
+            )
+        if f == t:
+            scale, offset = 1.0, 0.0
+        else:
+            scale = float(self.scales[f] / self.scales[t])
+            offset = float((self.offsets[f] - self.offsets[t]) / self.scales[t])
+        self._pairs[pair] = (scale, offset)
+        return scale, offset
+
+    def convert(self, value, from_unit, to_unit):
+        scale, offset = self.affine(from_unit, to_unit)
+        if isinstance(value, Measurement):
+            # The offset shifts the value but not its spread
+            return Measurement(value.value * scale + offset, value.sigma * abs(scale))
+        if isinstance(value, Interval):
+            low = value.low * scale + offset
+            high = value.high * scale + offset
+            return Interval(low, high) if low <= high else Interval(high, low)
+        return value * scale + offset
+
+    def affine32(self, from_unit, to_unit):
+        """The pair's (scale, offset) rounded once to float32 from the fused
+        float64 values, rather than combined from float32 unit factors."""
+        pair = (from_unit, to_unit)
+        cached = self._pairs32.get(pair)
+        if cached is None:
+            scale, offset = self.affine(from_unit, to_unit)
+            cached = self._pairs32[pair] = (np.float32(scale), np.float32(offset))
+        return cached
+
+    def float32_error_bound(self, from_unit, to_unit):
+        """Return (rel, abs) so that a float32 conversion of a float32 value
+        is within rel * |exact| + abs of the exact result, barring overflow.
+
+        Rounding the scale, the product and (with an offset) the offset and
+        the sum each add at most one float32 unit roundoff u. Scale-only
+        pairs are therefore within 2u (about 1.2e-7) relative. Offset pairs
+        are within 3u relative plus 5u * |offset| absolute (about 8e-5 K
+        for Celsius -> Kelvin), which dominates for results near zero.
+        """
+        _, offset = self.affine(from_unit, to_unit)
+        tiny = float(np.finfo(np.float32).smallest_subnormal)
+        if offset:
+            return 3 * FLOAT32_ROUNDING, 5 * FLOAT32_ROUNDING * abs(offset) + tiny
+        return 2 * FLOAT32_ROUNDING, tiny
+
+    def convert_array(self, values, from_unit, to_unit, out=None, check=False):
+        """Vectorized conversion of a whole array in one multiply-add pass.
+
+        float32 input is converted in float32 (half the memory traffic)
+        within float32_error_bound; everything else is computed in float64.
+        With check=True float32 results are verified against a float64
+        reference and PrecisionLoss is raised for any that miss the bound,
+        such as values that overflow float32.
+        """
+        values = np.asarray(values)
+        if values.dtype == np.float32:
+            scale, offset = self.affine32(from_unit, to_unit)
+        else:
+            scale, offset = self.affine(from_unit, to_unit)
+            values = np.asarray(values, dtype=np.float64)
+        out = np.multiply(values, scale, out=out)
+        if offset:
+            np.add(out, offset, out=out)
+        if check and values.dtype == np.float32:
+            self._check_float32(values, out, from_unit, to_unit)
+        return out
+
+    def _check_float32(self, values, out, from_unit, to_unit):
+        scale, offset = self.affine(from_unit, to_unit)
+        rel, abs_ = self.float32_error_bound(from_unit, to_unit)
+        reference = values.astype(np.float64) * scale + offset
+        error = np.abs(out - reference)
+        bad = np.flatnonzero(np.isfinite(reference) & ~(error <= rel * np.abs(reference) + abs_))
+        if len(bad):
+            i = bad[0]
+            raise PrecisionLoss(
+                f"{len(bad)} float32 {from_unit} -> {to_unit} result(s) off by more than the "
+                f"float32 error bound (first at index {i}: {float(values.ravel()[i])!r} gave "
+                f"{float(out.ravel()[i])!r}, expected {float(reference.ravel()[i])!r})"
+            )
+
+
+    def ids_of(self, units, size):
+        """Unit IDs for one unit name, or an array of names or IDs."""
+        if isinstance(units, str):
+            return np.full(size, self.unit_id(units), dtype=np.intp)
+        units = np.asarray(units)
+        if units.dtype.kind in "iu":
+            if units.size and (units.min() < 0 or units.max() >= len(self.unit_names)):
+                bad = units[(units < 0) | (units >= len(self.unit_names))][0]
+                raise UnknownUnit(f"#{bad}")
+            return units.astype(np.intp, copy=False)
+        names, inverse = np.unique(units, return_inverse=True)
+        return np.array([self.unit_id(str(name)) for name in names], dtype=np.intp)[inverse]
+
+    def convert_mixed(self, values, from_units, to_units, out=None):
+        """Convert arrays where every value has its own unit pair.
+
+        `from_units` and `to_units` are unit names or IDs, one per value (or
+        a single name for all). The pairs are checked in one vectorized pass,
+        then converted by the compiled kernel when numba is available.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        from_ids = self.ids_of(from_units, values.size).ravel()
+        to_ids = self.ids_of(to_units, values.size).ravel()
+        bad = np.flatnonzero(self.category_codes[from_ids] != self.category_codes[to_ids])
+        if len(bad):
+            from_unit = self.unit_names[from_ids[bad[0]]]
+            to_unit = self.unit_names[to_ids[bad[0]]]
+            raise IncompatibleCategory(
+                from_unit, self.unit_category[from_unit], to_unit, self.unit_category[to_unit]
+            )
+        return kernels.convert_mixed(values, from_ids, to_ids, self.scales, self.offsets, out)
+
+    def validate(self, values, units):
+        """Find NaN, infinite and physically impossible entries.
+
+        `units` is one unit name or an array of unit IDs, one per value. The
+        whole array is checked with one fused comparison; only the offending
+        entries are then classified.
+        """
+        values = np.asarray(values)
+        if values.dtype not in (np.float32, np.float64):
+            values = values.astype(np.float64)
+        if isinstance(units, str):
+            lower = self.lower_bounds[self.unit_id(units)]
+        else:
+            lower = self.lower_bounds[np.asarray(units, dtype=np.intp)]
+        if values.dtype == np.float32:
+            # Compare at float32 precision, or float32(-459.67) would fall
+            # just below the Fahrenheit minimum
+            lower = np.asarray(lower).astype(np.float32)
+        # NaN fails every comparison, -inf fails the first and +inf the second
+        bad = np.flatnonzero(~((values >= lower) & (values < np.inf)))
+        if len(bad) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return ValidationReport(empty, empty, empty)
+        bad_values = values.ravel()[bad]
+        nan = np.isnan(bad_values)
+        infinite = np.isinf(bad_values)
+        return ValidationReport(bad[nan], bad[infinite], bad[~nan & ~infinite])
+
+    def check(self, values, units):
+        """Raise OutOfRange if validate() finds anything."""
+        values = np.asarray(values, dtype=np.float64)
+        report = self.validate(values, units)
+        if len(report.nan) or len(report.infinite) or len(report.below):
+            if values.size == 1 and isinstance(units, str):
+                minimum = round(float(self.lower_bounds[self.unit_id(units)]), 6) + 0.0
+                raise OutOfRange(units, report, float(values.ravel()[0]), minimum)
+            raise OutOfRange(units if isinstance(units, str) else "unit", report)
+
+    def convert_measurements(self, pairs, from_unit, to_unit, out=None):
+        """Convert an (n, 2) array of (value, sigma) rows in a single pass.
+
+        Sigmas scale by |scale| and ignore the offset, so for the usual
+        positive scale the whole interleaved buffer is multiplied in one
+        contiguous pass and only the value column gets the offset.
+        """
+        scale, offset = self.affine(from_unit, to_unit)
+        pairs = np.asarray(pairs, dtype=np.float64)
+        out = np.multiply(pairs, abs(scale), out=out)
+        if scale < 0:
+            np.negative(out[:, 0], out=out[:, 0])
+        if offset:
+            np.add(out[:, 0], offset, out=out[:, 0])
+        return out
+
+    def convert_intervals(self, bounds, from_unit, to_unit, out=None):
+        """Convert an (n, 2) array of (low, high) rows, keeping low <= high."""
+        out = self.convert_measurements(bounds, from_unit, to_unit, out=out)
+        scale, _ = self.affine(from_unit, to_unit)
+        if scale < 0:
+            out[:, ::-1] = out.copy()
+        return out
+
+
+# Snapshot layout (little-endian): magic, format version, SHA-256 of the
+# source definitions, unit count, metadata length, then the JSON metadata
+# (category and unit names) and the scale/offset arrays, 8-byte aligned so
+# they can be used straight from the memory map.
+SNAPSHOT_MAGIC = b"UCREG\0\0\0"
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct("<8sI4x32sQQ")
+
+
+def source_digest(factors):
+    source = json.dumps([SNAPSHOT_VERSION, factors, TEMPERATURE_SCALES], sort_keys=True)
+    return hashlib.sha256(source.encode()).digest()
+
+
+def save_snapshot(registry, path, digest):
+    metadata = json.dumps({
+        "categories": list(registry.categories),
+        "units": registry.unit_names,
+        "unit_categories": [registry.unit_category[unit] for unit in registry.unit_names],
+    }, separators=(",", ":")).encode()
+    metadata += b" " * (-(_SNAPSHOT_HEADER.size + len(metadata)) % 8)
+    header = _SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, digest, len(registry.unit_names), len(metadata)
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Write aside and rename so concurrently starting workers never see half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(metadata)
+        f.write(registry.scales.astype("<f8").tobytes())
+        f.write(registry.offsets.astype("<f8").tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, digest):
+    """Memory-map a snapshot; returns None if it is missing, stale or corrupt."""
+    try:
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, version, stored_digest, count, metadata_size = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or stored_digest != digest:
+            return None
+        offset = _SNAPSHOT_HEADER.size
+        metadata = json.loads(data[offset:offset + metadata_size])
+        offset += metadata_size
+        scales = np.frombuffer(data, dtype="<f8", count=count, offset=offset)
+        offsets = np.frombuffer(data, dtype="<f8", count=count, offset=offset + 8 * count)
+    except (struct.error, ValueError):
+        return None
+    return UnitRegistry(
+        metadata["categories"], metadata["units"], metadata["unit_categories"],
+        scales, offsets
+    )
+
+
+def load_registry(factors, cache_path=None):
+    """Load the compiled registry from its snapshot, recompiling (and
+    rewriting the snapshot) only when the source definitions changed."""
+    if cache_path is None:
+        cache_path = os.environ.get(REGISTRY_CACHE_ENV_VAR, REGISTRY_CACHE_PATH)
+    if cache_path in ("", "off"):
+        return UnitRegistry.compile(factors)
+    digest = source_digest(factors)
+    registry = load_snapshot(cache_path, digest)
+    if registry is None:
+        registry = UnitRegistry.compile(factors)
+        try:
+            save_snapshot(registry, cache_path, digest)
+        except OSError:
+            # A read-only deployment still works, it just compiles every start
+            pass
+    return registry
+
+
+REGISTRY = load_registry(CONVERSION_FACTORS)
@@ -0,0 +1,93 @@
+# formatting.py
+# Bulk number and result formatting. Arrays are rendered with a single
+# %-template applied to the whole batch, so the batch and history paths never
+# rebuild one f-string per entry.
+import html
+
+import numpy as np
+
+NOTATIONS = ("fixed", "significant", "engineering")
+
+
+def _bulk(template, *columns):
+    # One "%" operation for the whole batch; splitting is cheaper than
+    # formatting row by row
+    n = len(columns[0])
+    if n == 0:
+        return []
+    args = np.empty((n, len(columns)), dtype=object)
+    for i, column in enumerate(columns):
+        args[:, i] = column
+    text = ((template + "\n") * n) % tuple(args.ravel().tolist())
+    return text.split("\n")[:-1]
+
+
+def _number_template(precision, notation):
+    if notation == "fixed":
+        return f"%.{precision}f"
+    if notation == "significant":
+        return f"%.{max(precision, 1)}g"
+    if notation == "engineering":
+        return f"%.{precision}f%s"
+    raise ValueError(f"Unknown notation: {notation}")
+
+
+def _number_columns(values, precision, notation):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    if notation != "engineering":
+        return [values.tolist()]
+    finite = np.isfinite(values) & (values != 0)
+    magnitude = np.abs(np.where(finite, values, 1.0))
+    exponent = (np.floor(np.log10(magnitude) / 3) * 3).astype(np.int64)
+    # Rounding can carry a mantissa such as 999.99996 up to 1000.0000
+    carry = finite & (np.abs(np.round(values / 10.0 ** exponent, precision)) >= 1000)
+    exponent = np.where(carry, exponent + 3, exponent)
+    mantissa = np.where(finite, values / 10.0 ** exponent, values)
+    suffix = np.where(finite, np.char.mod("e%d", exponent), "")
+    return [mantissa.tolist(), suffix.tolist()]
+
+
+def format_values(values, precision=4, notation="fixed"):
+    """Format an array of numbers into a list of strings.
+
+    "fixed" uses `precision` decimal places, "significant" keeps `precision`
+    significant figures and "engineering" prints a mantissa with an exponent
+    that is a multiple of three.
+    """
+    template = _number_template(precision, notation)
+    return _bulk(template, *_number_columns(values, precision, notation))
+
+
+def format_value(value, precision=4, notation="fixed"):
+    return format_values([value], precision, notation)[0]
+
+
+def format_conversions(values, from_units, converted, to_units,
+                       precision=4, notation="fixed"):
+    """Build "<value> <from> = <converted> <to>" lines for whole arrays.
+
+    The unit arguments may be a single name or one name per row.
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    number = _number_template(precision, notation)
+    columns = [values.tolist()]
+    if isinstance(from_units, str):
+        template = f"%r {from_units.replace('%', '%%')} = {number}"
+    else:
+        template = f"%r %s = {number}"
+        columns.append(list(from_units))
+    columns += _number_columns(converted, precision, notation)
+    if isinstance(to_units, str):
+        template += f" {to_units.replace('%', '%%')}"
+    else:
+        template += " %s"
+        columns.append(list(to_units))
+    return _bulk(template, *columns)
+
+
+def render_history_html(entries):
+    """Render history, newest first, as a single HTML block."""
+    if not entries:
+        return ""
+    rows = "</li><li>".join(map(html.escape, reversed(entries)))
+    return f"<ol class='history-list' reversed><li>{rows}</li></ol>"
@@ -0,0 +1,139 @@
+# history.py
+# Conversion history stored as columns, with the analytics aggregates kept up
+# to date on every append so the analytics panel never rescans the history.
+import math
+import sys
+import time
+from array import array
+
+import pandas as pd
+
+from conversion import REGISTRY
+
+COLUMNS = ("timestamp", "category", "from_unit", "to_unit", "value", "result", "text")
+
+# Conversions over time are bucketed per minute
+TIME_BUCKET = 60
+
+
+class CategoryStats:
+    """Running count/mean/variance (Welford) and min/max of input values,
+    plus a histogram of their magnitudes by power of ten. Values are in the
+    category's base unit, so inputs in different units are comparable."""
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "decades")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.decades = {}
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        decade = math.floor(math.log10(abs(value))) if value else None
+        self.decades[decade] = self.decades.get(decade, 0) + 1
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class ConversionHistory:
+    def __init__(self):
+        self.timestamp = array("d")
+        self.category = []
+        self.from_unit = []
+        self.to_unit = []
+        self.value = array("d")
+        self.result = array("d")
+        self.text = []
+        self.pair_counts = {}
+        self.per_bucket = {}
+        self.category_stats = {}
+
+    def __len__(self):
+        return len(self.text)
+
+    def append(self, value, from_unit, to_unit, category, result, text, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        # Unit and category names repeat endlessly; keep one copy of each
+        category, from_unit, to_unit = map(sys.intern, (category, from_unit, to_unit))
+        self.timestamp.append(timestamp)
+        self.category.append(category)
+        self.from_unit.append(from_unit)
+        self.to_unit.append(to_unit)
+        self.value.append(value)
+        self.result.append(result)
+        self.text.append(text)
+
+        pair = (category, from_unit, to_unit)
+        self.pair_counts[pair] = self.pair_counts.get(pair, 0) + 1
+        bucket = int(timestamp // TIME_BUCKET) * TIME_BUCKET
+        self.per_bucket[bucket] = self.per_bucket.get(bucket, 0) + 1
+        stats = self.category_stats.get(category)
+        if stats is None:
+            stats = self.category_stats[category] = CategoryStats()
+        scale, offset = REGISTRY.affine(from_unit, REGISTRY.base_units[category])
+        stats.add(value * scale + offset)
+
+    def top_pairs(self, n=10):
+        pairs = sorted(self.pair_counts.items(), key=lambda item: -item[1])[:n]
+        return pd.DataFrame(
+            [(f"{f} → {t}", category, count) for (category, f, t), count in pairs],
+            columns=["Pair", "Category", "Conversions"]
+        )
+
+    def over_time(self):
+        buckets = sorted(self.per_bucket.items())
+        return pd.Series(
+            [count for _, count in buckets],
+            index=pd.to_datetime([bucket for bucket, _ in buckets], unit="s"),
+            name="Conversions"
+        )
+
+    def category_summary(self):
+        return pd.DataFrame(
+            [
+                (category, REGISTRY.base_units[category], s.count, s.mean, s.std, s.min, s.max)
+                for category, s in self.category_stats.items()
+            ],
+            columns=["Category", "Unit", "Count", "Mean", "Std", "Min", "Max"]
+        )
+
+    def value_distribution(self, category):
+        stats = self.category_stats.get(category)
+        if stats is None:
+            return pd.Series(dtype="int64", name="Conversions")
+        decades = sorted(stats.decades.items(), key=lambda item: (item[0] is not None, item[0] or 0))
+        return pd.Series(
+            [count for _, count in decades],
+            index=["0" if d is None else f"1e{d}" for d, _ in decades],
+            name="Conversions"
+        )
+
+    def to_frame(self):
+        frame = pd.DataFrame({name: getattr(self, name) for name in COLUMNS})
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], unit="s")
+        for name in ("category", "from_unit", "to_unit"):
+            frame[name] = frame[name].astype("category")
+        return frame
+
+    def to_dict(self):
+        return {name: list(getattr(self, name)) for name in COLUMNS}
+
+    @classmethod
+    def from_dict(cls, data):
+        history = cls()
+        for row in zip(*(data[name] for name in COLUMNS)):
+            timestamp, category, from_unit, to_unit, value, result, text = row
+            history.append(value, from_unit, to_unit, category, result, text, timestamp)
+        return history
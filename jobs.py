@@ -0,0 +1,352 @@
+# jobs.py
+# Background queue for bulk conversions, so a large upload never runs in a
+# Streamlit script thread. A small pool of worker threads converts jobs in
+# slices; after every slice the scheduler picks again, by priority first and
+# then by fair share between owners (sessions): the owner that has been
+# served the fewest values goes next. One huge job therefore can't hold the
+# pool while other sessions wait, and cancellation lands between slices.
+#
+# The pool size is set with UNIT_CONVERTER_JOB_WORKERS (default: CPU count,
+# at most 4). NumPy releases the GIL while converting a slice.
+#
+# Finished jobs keep their input, result and CSV until dismissed, for at
+# most FINISHED_TTL seconds, and only the newest MAX_FINISHED_PER_OWNER of
+# each owner's, so sessions that have ended don't hold memory forever.
+import heapq
+import io
+import itertools
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from audit_log import get_audit_log
+from conversion import REGISTRY, OutOfRange, ValidationReport
+from metrics import Counter, Gauge, Histogram
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
+
+WORKERS_ENV_VAR = "UNIT_CONVERTER_JOB_WORKERS"
+
+# Lower runs first
+INTERACTIVE = 0
+BULK = 10
+
+# Values converted per scheduling decision
+SLICE_SIZE = 65_536
+
+# How long finished jobs are kept, and how many per owner
+FINISHED_TTL = 3600
+MAX_FINISHED_PER_OWNER = 20
+# Idle workers check for expired jobs this often
+EVICT_INTERVAL = 60
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    def __init__(self, owner, from_unit, to_unit, priority, values=None, loader=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.from_unit = from_unit
+        self.to_unit = to_unit
+        self.priority = priority
+        self.status = QUEUED
+        self.error = None
+        self.values = values
+        self.result = None
+        self._csv_parts = []
+        self.done = 0
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self._loader = loader
+        self._cancel = False
+        self._busy = False
+        self._finished = threading.Event()
+
+    @property
+    def total(self):
+        return 0 if self.values is None else self.values.size
+
+    @property
+    def progress(self):
+        if self.status == DONE:
+            return 1.0
+        return self.done / self.total if self.total else 0.0
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    def to_csv(self):
+        """Input and converted columns as CSV bytes, once the job is done.
+        Rows are formatted slice by slice by the workers, so this only joins."""
+        if self.status != DONE:
+            return None
+        if len(self._csv_parts) > 1:
+            self._csv_parts = [b"".join(self._csv_parts)]
+        return self._csv_parts[0] if self._csv_parts else b""
+
+
+def _csv_rows(columns, header):
+    if pa_csv is not None:
+        # Arrow's writer formats in C++ without holding the GIL
+        sink = io.BytesIO()
+        pa_csv.write_csv(pa.table(columns), sink,
+                         pa_csv.WriteOptions(include_header=header, quoting_style="none"))
+        return sink.getvalue()
+    return pd.DataFrame(columns).to_csv(index=False, header=header).encode()
+
+
+class JobQueue:
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = int(os.environ.get(WORKERS_ENV_VAR, min(os.cpu_count() or 1, 4)))
+        self._cond = threading.Condition()
+        self._jobs = {}
+        # owner -> heap of (priority, sequence, job) with work left
+        self._pending = {}
+        # owner -> values served; a newly active owner starts at the current
+        # virtual time instead of 0 so it can't claim everyone's past share
+        self._served = {}
+        self._clock = 0
+        self._sequence = itertools.count()
+        self._running = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"jobs-{i}", daemon=True)
+            for i in range(max(workers, 1))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, values, from_unit, to_unit, owner="", priority=BULK):
+        """Queue an array conversion; returns the Job to poll."""
+        REGISTRY.affine(from_unit, to_unit)
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        return self._enqueue(Job(owner, from_unit, to_unit, priority, values=values))
+
+    def submit_csv(self, data, column, from_unit, to_unit, owner="", priority=BULK):
+        """Queue conversion of one column of CSV bytes; parsing happens in a worker."""
+        REGISTRY.affine(from_unit, to_unit)
+
+        def load():
+            frame = pd.read_csv(io.BytesIO(data), usecols=[column])
+            return frame[column].to_numpy(dtype=np.float64)
+
+        return self._enqueue(Job(owner, from_unit, to_unit, priority, loader=load))
+
+    def _enqueue(self, job):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Job queue is shut down")
+            self._evict()
+            self._jobs[job.id] = job
+            self._push(job)
+            self._cond.notify()
+        JOBS.inc(QUEUED)
+        return job
+
+    def _push(self, job):
+        if job.owner not in self._pending:
+            self._served[job.owner] = max(self._served.get(job.owner, 0), self._clock)
+            self._pending[job.owner] = []
+        heapq.heappush(self._pending[job.owner], (job.priority, next(self._sequence), job))
+
+    def _next(self):
+        owner = min(
+            self._pending,
+            key=lambda o: (self._pending[o][0][0], self._served[o])
+        )
+        heap = self._pending[owner]
+        _, _, job = heapq.heappop(heap)
+        if not heap:
+            del self._pending[owner]
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self, owner):
+        with self._cond:
+            self._evict()
+            return [job for job in self._jobs.values() if job.owner == owner]
+
+    def cancel(self, job_id):
+        """Cancel a job; one that is mid-slice stops when the slice ends."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job._cancel = True
+            if not job._busy:
+                self._remove_pending(job)
+                self._finish(job, CANCELLED)
+            return True
+
+    def _remove_pending(self, job):
+        heap = self._pending.get(job.owner, [])
+        heap[:] = [entry for entry in heap if entry[2] is not job]
+        heapq.heapify(heap)
+        if not heap:
+            self._pending.pop(job.owner, None)
+
+    def forget(self, job_id):
+        """Drop a finished job and its result."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in FINISHED:
+                del self._jobs[job_id]
+
+    def _evict(self):
+        # Caller holds self._cond
+        expired = time.time() - FINISHED_TTL
+        finished = {}
+        for job in list(self._jobs.values()):
+            if job.status not in FINISHED:
+                continue
+            if job.finished < expired:
+                del self._jobs[job.id]
+            else:
+                finished.setdefault(job.owner, []).append(job)
+        for jobs in finished.values():
+            if len(jobs) > MAX_FINISHED_PER_OWNER:
+                jobs.sort(key=lambda job: job.finished)
+                for job in jobs[:-MAX_FINISHED_PER_OWNER]:
+                    del self._jobs[job.id]
+
+    def depth(self):
+        """Jobs waiting for or between slices."""
+        with self._cond:
+            return sum(len(heap) for heap in self._pending.values())
+
+    def running(self):
+        return self._running
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _finish(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        job._finished.set()
+        JOBS.inc(status)
+        JOB_LATENCY.observe(job.finished - job.submitted, status)
+        self._evict()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    if not self._cond.wait(EVICT_INTERVAL):
+                        self._evict()
+                if not self._pending:
+                    return
+                job = self._next()
+                if job.started is None:
+                    job.started = time.time()
+                    job.status = RUNNING
+                    JOB_WAIT.observe(job.started - job.submitted)
+                job._busy = True
+                self._running += 1
+                start = job.done
+                stop = start + SLICE_SIZE
+                self._clock = self._served[job.owner]
+                self._served[job.owner] += SLICE_SIZE
+            try:
+                finished = self._run_slice(job, start, stop)
+                error = None
+            except Exception as e:
+                # A bad upload fails its own job, never the worker
+                finished, error = True, str(e)
+            with self._cond:
+                job._busy = False
+                self._running -= 1
+                if error is not None:
+                    self._finish(job, FAILED, error)
+                elif job._cancel:
+                    self._finish(job, CANCELLED)
+                elif finished:
+                    self._finish(job, DONE)
+                else:
+                    self._push(job)
+                    self._cond.notify()
+
+    def _run_slice(self, job, start, stop):
+        # Loading an uploaded file counts as the job's first slice
+        if job.values is None:
+            job.values = job._loader()
+            job._loader = None
+            job.result = np.empty_like(job.values)
+            return False
+        if job.result is None:
+            job.result = np.empty_like(job.values)
+        values = job.values.reshape(-1)[start:stop]
+        report = REGISTRY.validate(values, job.from_unit)
+        if len(report.nan) or len(report.infinite) or len(report.below):
+            raise OutOfRange(job.from_unit, ValidationReport(*(indices + start for indices in report)))
+        results = REGISTRY.convert_array(values, job.from_unit, job.to_unit,
+                                         out=job.result.reshape(-1)[start:stop])
+        audit = get_audit_log()
+        if audit is not None:
+            audit.record_many(values, job.from_unit, job.to_unit, results)
+        to_column = job.to_unit if job.to_unit != job.from_unit else f"{job.to_unit} (converted)"
+        job._csv_parts.append(_csv_rows(
+            {job.from_unit: values, to_column: results},
+            header=start == 0
+        ))
+        job.done = start + values.size
+        return job.done >= job.total
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
+
+
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+JOBS = Counter(
+    "unit_converter_jobs_total", "Bulk conversion jobs by state reached", ("status",)
+)
+JOB_WAIT = Histogram(
+    "unit_converter_job_wait_seconds", "Time from submission to a job's first slice",
+    JOB_BUCKETS
+)
+JOB_LATENCY = Histogram(
+    "unit_converter_job_seconds", "Time from submission to a job finishing",
+    JOB_BUCKETS, ("status",)
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "unit_converter_job_queue_depth", "Bulk conversion jobs waiting for a worker",
+    lambda: _queue.depth() if _queue is not None else 0
+)
+JOBS_RUNNING = Gauge(
+    "unit_converter_jobs_running", "Workers currently converting a slice",
+    lambda: _queue.running() if _queue is not None else 0
+)
@@ -0,0 +1,129 @@
+# kernels.py
+# Conversion of arrays where every row has its own unit pair. The fallback
+# is plain NumPy (a few gathers plus whole-array arithmetic). When numba is
+# installed the same arithmetic runs as one compiled loop: gather both
+# units' scale and offset, then multiply-add, without any temporary arrays.
+# Compiled code is cached on disk, and warmup.py compiles it for the
+# registry's arrays before the first request. Set UNIT_CONVERTER_JIT=off to force the NumPy path.
+#
+# Both paths compute value * (s_from / s_to) + (o_from - o_to) / s_to, the
+# same operations as UnitRegistry.affine, so results match the
+# single-pair paths bit for bit.
+#
+#     python kernels.py [--rows 10000000]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+JIT_ENV_VAR = "UNIT_CONVERTER_JIT"
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _convert_mixed_numpy(values, from_ids, to_ids, scales, offsets, out):
+    to_scale = scales.take(to_ids)
+    scale = scales.take(from_ids)
+    np.divide(scale, to_scale, out=scale)
+    offset = offsets.take(from_ids)
+    np.subtract(offset, offsets.take(to_ids), out=offset)
+    np.divide(offset, to_scale, out=offset)
+    np.multiply(values, scale, out=out)
+    np.add(out, offset, out=out)
+    return out
+
+
+def _convert_mixed_loop(values, from_ids, to_ids, scales, offsets, out):
+    for i in range(values.shape[0]):
+        f = from_ids[i]
+        t = to_ids[i]
+        to_scale = scales[t]
+        out[i] = values[i] * (scales[f] / to_scale) + (offsets[f] - offsets[t]) / to_scale
+    return out
+
+
+if numba is not None and os.environ.get(JIT_ENV_VAR, "on") != "off":
+    _convert_mixed_compiled = numba.njit(cache=True, nogil=True)(_convert_mixed_loop)
+else:
+    _convert_mixed_compiled = None
+
+BACKEND = "numba" if _convert_mixed_compiled is not None else "numpy"
+
+
+def convert_mixed(values, from_ids, to_ids, scales, offsets, out=None):
+    """Convert values[i] from unit from_ids[i] to unit to_ids[i].
+
+    All arrays are 1-D and the IDs index `scales` and `offsets`; checking
+    that IDs are valid and pairs compatible is the caller's job.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    from_ids = np.ascontiguousarray(from_ids, dtype=np.intp)
+    to_ids = np.ascontiguousarray(to_ids, dtype=np.intp)
+    if out is None:
+        out = np.empty_like(values)
+    if _convert_mixed_compiled is not None:
+        return _convert_mixed_compiled(values, from_ids, to_ids, scales, offsets, out)
+    return _convert_mixed_numpy(values, from_ids, to_ids, scales, offsets, out)
+
+
+def benchmark(rows=10_000_000):
+    from conversion import REGISTRY, convert_units
+
+    rng = np.random.default_rng(0)
+    categories = REGISTRY.category_codes
+    from_ids = rng.integers(0, len(REGISTRY.unit_names), rows)
+    # A random unit of the same category for every row
+    choices = [np.flatnonzero(categories == c) for c in range(len(REGISTRY.categories))]
+    pick = rng.integers(0, 1 << 30, rows)
+    to_ids = np.empty(rows, dtype=np.intp)
+    for c, members in enumerate(choices):
+        rows_in = categories[from_ids] == c
+        to_ids[rows_in] = members[pick[rows_in] % len(members)]
+    values = rng.uniform(0, 1000, rows)
+
+    sample = 100_000
+    names = REGISTRY.unit_names
+    started = time.perf_counter()
+    for v, f, t in zip(values[:sample].tolist(), from_ids[:sample].tolist(), to_ids[:sample].tolist()):
+        convert_units(v, names[f], names[t], REGISTRY.unit_category[names[f]])
+    per_row = (time.perf_counter() - started) / sample
+
+    timings = {"python loop (convert_units)": per_row}
+    started = time.perf_counter()
+    expected = _convert_mixed_numpy(values, from_ids, to_ids, REGISTRY.scales, REGISTRY.offsets,
+                                    np.empty_like(values))
+    timings["numpy gathers"] = (time.perf_counter() - started) / rows
+    if _convert_mixed_compiled is not None:
+        # The first call compiles (or loads the cached machine code)
+        convert_mixed(values[:1], from_ids[:1], to_ids[:1], REGISTRY.scales, REGISTRY.offsets)
+        started = time.perf_counter()
+        result = convert_mixed(values, from_ids, to_ids, REGISTRY.scales, REGISTRY.offsets)
+        timings["numba loop"] = (time.perf_counter() - started) / rows
+        assert np.array_equal(result, expected)
+    else:
+        print("numba is not installed; only the NumPy path is timed")
+
+    started = time.perf_counter()
+    REGISTRY.convert_mixed(values, from_ids, to_ids)
+    timings[f"REGISTRY.convert_mixed ({BACKEND}, checked)"] = (time.perf_counter() - started) / rows
+
+    print(f"{rows:,} rows with per-row unit pairs:")
+    for name, seconds in timings.items():
+        print(f"  {name:<40} {seconds * 1e9:9.2f} ns/row  {1 / seconds / 1e6:9.1f}M rows/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mixed-unit conversion kernels")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    args = parser.parse_args(argv)
+    benchmark(args.rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
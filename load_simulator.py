@@ -0,0 +1,258 @@
+# load_simulator.py
+# Capacity estimate for one `streamlit run unit_converter.py` process. Drives
+# N concurrent simulated sessions through the app with Streamlit's AppTest,
+# each on its own thread in this process, so the sessions share one
+# interpreter, GIL, session store and job queue as they would in the server.
+# Every session repeats an interaction script (select category, swap, convert,
+# open the history analytics); every step is a full script rerun.
+#
+# For each session count it reports reruns per second, p50/p95/p99 rerun
+# latency, CPU used (in cores), RSS, the size of a rendered page and the
+# history length reached. Three things dominate and are reported separately:
+#   - Convert sleeps 0.5 s: it occupies a script thread, not the CPU, so it
+#     sets per-session latency but not capacity
+#   - the base64 profile image (~470 KB) is part of every rendered page; the
+#     size shown is what a rerun renders before Streamlit's message cache
+#   - history is unbounded, so history rendering grows with every conversion
+#
+#     python load_simulator.py [--sessions 1,2,4,8,16] [--duration 20] [--script browse] [--think 0]
+import argparse
+import gc
+import logging
+import os
+import random
+import resource
+import sys
+import threading
+import time
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_SCRIPT = os.path.join(APP_DIR, "unit_converter.py")
+
+# time.sleep() in the Convert handler
+CONVERT_SLEEP = 0.5
+
+# Interaction scripts, repeated until the run ends
+SCRIPTS = {
+    # A user exploring: change category, convert, swap and convert back, look at history
+    "browse": ("category", "value", "convert", "swap", "convert", "history"),
+    # A user converting many values in one unit pair
+    "convert": ("value", "convert"),
+    # Widget changes only: no sleep, no history growth
+    "widgets": ("category", "swap", "value"),
+}
+
+
+def _button(at, label):
+    return next(button for button in at.button if button.label == label)
+
+
+def _step(at, action, rng):
+    if action == "category":
+        select = at.selectbox(key="category_select")
+        return select.select(rng.choice([c for c in select.options if c != select.value]))
+    if action == "swap":
+        return _button(at, "🔄 Swap Units").click()
+    if action == "value":
+        return at.number_input[0].set_value(round(rng.uniform(0, 1000), 2))
+    if action == "convert":
+        return _button(at, "Convert").click()
+    if action == "history":
+        # History Analytics exists once something was converted
+        selects = [s for s in at.selectbox if s.key == "analytics_category"]
+        if not selects:
+            return None
+        return selects[0].select(rng.choice(selects[0].options))
+    raise ValueError(f"Unknown action {action!r}")
+
+
+def rendered_bytes(node):
+    """Serialized size of every element in an AppTest element tree."""
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        return sum(rendered_bytes(child) for child in children.values())
+    proto = getattr(node, "proto", None)
+    return proto.ByteSize() if proto is not None else 0
+
+
+class Session(threading.Thread):
+    def __init__(self, index, script, start, deadline, think, seed):
+        super().__init__(name=f"session-{index}", daemon=True)
+        self.script = SCRIPTS[script]
+        self.start_event = start
+        self.deadline = deadline
+        self.think = think
+        self.rng = random.Random(seed + index)
+        # (action, seconds) for every rerun
+        self.samples = []
+        self.error = None
+        self.page_bytes = 0
+        self.history = 0
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        try:
+            at = AppTest.from_file(APP_SCRIPT, default_timeout=300)
+            self.start_event.wait()
+            self._timed(at, "load")
+            position = 0
+            while time.perf_counter() < self.deadline[0]:
+                action = self.script[position % len(self.script)]
+                position += 1
+                element = _step(at, action, self.rng)
+                if element is None:
+                    continue
+                self._timed(element, action)
+                if at.exception:
+                    raise RuntimeError(at.exception[0].message)
+                if self.think:
+                    time.sleep(self.rng.expovariate(1 / self.think))
+            self.page_bytes = rendered_bytes(at._tree)
+            self.history = len(at.session_state.history)
+        except Exception as e:
+            self.error = e
+
+    def _timed(self, element, action):
+        started = time.perf_counter()
+        element.run()
+        self.samples.append((action, time.perf_counter() - started))
+
+
+_patched = False
+
+
+def _share_server_state():
+    """Make concurrent AppTest sessions share what the server shares.
+
+    The server compiles the script once into a process-wide cache; AppTest
+    builds a new cache, and recompiles, on every rerun (concurrent ast.parse
+    calls also crash CPython before 3.11.8). The server has one Runtime;
+    AppTest installs a mock Runtime per run and clears it when the run ends,
+    under runs still going in other threads. All sessions get one cache and
+    keep the first Runtime.
+    """
+    global _patched
+    if _patched:
+        return
+    _patched = True
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import local_script_runner
+
+    cache = ScriptCache()
+    local_script_runner.ScriptCache = lambda: cache
+
+    shared = []
+
+    def instance(cls):
+        if not shared:
+            if cls._instance is None:
+                raise RuntimeError("Runtime hasn't been created!")
+            shared.append(cls._instance)
+        return shared[0]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: bool(shared) or cls._instance is not None)
+
+
+def _rss():
+    """Current resident set size in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak instead of current where /proc isn't available (kB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def simulate(sessions, duration=20.0, script="browse", think=0.0, seed=0):
+    """Run `sessions` concurrent sessions for `duration` seconds; returns a result dict."""
+    start = threading.Event()
+    deadline = [float("inf")]
+    _share_server_state()
+    threads = [Session(i, script, start, deadline, think, seed) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    # Let every session build its AppTest before the clock starts
+    time.sleep(0.1)
+    cpu = _cpu_seconds()
+    started = time.perf_counter()
+    deadline[0] = started + duration
+    start.set()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    cpu = _cpu_seconds() - cpu
+
+    errors = [thread.error for thread in threads if thread.error is not None]
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {sessions} sessions failed: {errors[0]!r}")
+    samples = [sample for thread in threads for sample in thread.samples]
+    latencies = np.array([seconds for _, seconds in samples])
+    converts = np.array([seconds for action, seconds in samples if action == "convert"])
+    slept = CONVERT_SLEEP * len(converts)
+    result = {
+        "sessions": sessions,
+        "reruns": len(samples),
+        "throughput": len(samples) / wall,
+        "p50": np.percentile(latencies, 50),
+        "p95": np.percentile(latencies, 95),
+        "p99": np.percentile(latencies, 99),
+        "convert_p50": np.percentile(converts, 50) if len(converts) else float("nan"),
+        # Share of all rerun time spent in the Convert sleep
+        "sleep_share": slept / latencies.sum(),
+        "cpu_cores": cpu / wall,
+        "cpu_per_rerun": cpu / len(samples),
+        "rss": _rss(),
+        "page_bytes": np.mean([thread.page_bytes for thread in threads]),
+        "history": np.mean([thread.history for thread in threads]),
+    }
+    del threads, samples
+    gc.collect()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent sessions of the Streamlit app")
+    parser.add_argument("--sessions", default="1,2,4,8,16",
+                        help="comma-separated session counts to run in turn")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per session count")
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="browse")
+    parser.add_argument("--think", type=float, default=0.0,
+                        help="mean think time between interactions, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    # AppTest reruns log "missing ScriptRunContext" and deprecation notices, and
+    # reset Streamlit's logger levels when they load its config
+    logging.disable(logging.WARNING)
+
+    baseline = _rss()
+    print(f"Script {args.script!r}: {' → '.join(SCRIPTS[args.script])}, "
+          f"{args.duration:g} s per level, think time {args.think:g} s, RSS before Streamlit loads {baseline / 2**20:.0f} MB")
+    print(f"{'sessions':>8} {'reruns/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'convert p50':>11} {'sleep %':>7} {'cpu cores':>9} {'cpu ms/rerun':>12} "
+          f"{'RSS MB':>7} {'page KB':>8} {'history':>7}")
+    for sessions in (int(n) for n in args.sessions.split(",")):
+        r = simulate(sessions, args.duration, args.script, args.think, args.seed)
+        convert = f"{r['convert_p50'] * 1e3:.0f}ms" if r["convert_p50"] == r["convert_p50"] else "-"
+        print(f"{r['sessions']:>8} {r['throughput']:>9.1f} {r['p50'] * 1e3:>8.0f} {r['p95'] * 1e3:>8.0f} "
+              f"{r['p99'] * 1e3:>8.0f} {convert:>11} {r['sleep_share'] * 100:>6.0f}% "
+              f"{r['cpu_cores']:>9.2f} {r['cpu_per_rerun'] * 1e3:>12.1f} {r['rss'] / 2**20:>7.0f} "
+              f"{r['page_bytes'] / 1e3:>8.0f} {r['history']:>7.0f}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
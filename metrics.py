@@ -0,0 +1,269 @@
+# metrics.py
+# Prometheus-style metrics for conversion traffic, served as text exposition
+# format from a small local HTTP endpoint (/metrics, plus /ready for the
+# warm-up readiness signal).
+#
+# Recording is lock-free: every thread writes only to its own shard (a plain
+# dict), and a scrape sums the shards. Shards of threads that have exited are
+# folded into a retired shard so the list doesn't grow with Streamlit's
+# short-lived script threads.
+import bisect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PORT_ENV_VAR = "UNIT_CONVERTER_METRICS_PORT"
+DEFAULT_PORT = 9464
+
+# Sessions not seen for this long no longer count as active
+SESSION_TIMEOUT = 300
+
+logger = logging.getLogger(__name__)
+
+_METRICS = []
+
+
+class _Sharded:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+        _METRICS.append(self)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            # Taken once per thread, never on the recording path
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _collect(self):
+        with self._shards_lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            shards = [self._retired] + [shard for _, shard in live]
+        total = {}
+        for shard in shards:
+            self._merge(total, shard)
+        return total
+
+    def _labels(self, values):
+        if not self.labelnames:
+            return ""
+        pairs = ",".join(
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values)
+        )
+        return "{" + pairs + "}"
+
+
+class Counter(_Sharded):
+    type = "counter"
+
+    def inc(self, *labels):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + 1
+
+    def _merge(self, into, shard):
+        for labels, count in list(shard.items()):
+            into[labels] = into.get(labels, 0) + count
+
+    def expose(self):
+        return [
+            f"{self.name}{self._labels(labels)} {count}"
+            for labels, count in sorted(self._collect().items())
+        ]
+
+
+class Histogram(_Sharded):
+    type = "histogram"
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # Per-bucket counts, then the overflow (+Inf) bucket, then the sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _merge(self, into, shard):
+        for labels, state in list(shard.items()):
+            merged = into.setdefault(labels, [0] * len(state[:-1]) + [0.0])
+            for i, count in enumerate(state):
+                merged[i] += count
+
+    def expose(self):
+        lines = []
+        for labels, state in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), state[:-1]):
+                cumulative += count
+                le = dict(zip(self.labelnames, labels))
+                le["le"] = bound
+                pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in le.items())
+                lines.append(f"{self.name}_bucket{{{pairs}}} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {state[-1]}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    type = "gauge"
+
+    def __init__(self, name, help, callback):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        _METRICS.append(self)
+
+    def expose(self):
+        return [f"{self.name} {self.callback()}"]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Session bookkeeping for the gauges: session id -> (last seen, history size)
+_sessions = {}
+
+
+def record_session(session_id, history_size):
+    _sessions[session_id] = (time.monotonic(), history_size)
+
+
+def _active_sessions():
+    cutoff = time.monotonic() - SESSION_TIMEOUT
+    for session_id, (seen, _) in list(_sessions.items()):
+        if seen < cutoff:
+            _sessions.pop(session_id, None)
+    return dict(_sessions)
+
+
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 1e-3, 1e-2)
+RERUN_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+CONVERSIONS = Counter(
+    "unit_converter_conversions_total", "Conversions requested",
+    ("category", "from_unit", "to_unit")
+)
+CONVERSION_ERRORS = Counter(
+    "unit_converter_conversion_errors_total", "Conversions that raised an error",
+    ("category",)
+)
+CONVERSION_LATENCY = Histogram(
+    "unit_converter_conversion_seconds", "Time spent in convert_units",
+    LATENCY_BUCKETS, ("category",)
+)
+RERUN_DURATION = Histogram(
+    "unit_converter_rerun_seconds", "Duration of a full script rerun",
+    RERUN_BUCKETS
+)
+ACTIVE_SESSIONS = Gauge(
+    "unit_converter_active_sessions", "Sessions seen in the last five minutes",
+    lambda: len(_active_sessions())
+)
+HISTORY_ENTRIES = Gauge(
+    "unit_converter_history_entries", "History entries held by active sessions",
+    lambda: sum(size for _, size in _active_sessions().values())
+)
+HISTORY_ENTRIES_MAX = Gauge(
+    "unit_converter_history_entries_max", "Largest history held by one active session",
+    lambda: max((size for _, size in _active_sessions().values()), default=0)
+)
+
+
+_recorder = threading.local()
+
+
+def record_conversion(category, from_unit, to_unit, elapsed):
+    """Hot-path recorder for convert_units: bumps the per-pair counter and the
+    latency histogram with a single thread-local lookup."""
+    try:
+        counts, latency = _recorder.shards
+    except AttributeError:
+        counts, latency = _recorder.shards = (
+            CONVERSIONS._shard(), CONVERSION_LATENCY._shard()
+        )
+    key = (category, from_unit, to_unit)
+    counts[key] = counts.get(key, 0) + 1
+    key = (category,)
+    state = latency.get(key)
+    if state is None:
+        state = latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+    state[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+    state[-1] += elapsed
+
+
+def exposition():
+    lines = []
+    for metric in _METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/ready":
+            from warmup import READY
+            status = 200 if READY.is_set() else 503
+            body = b"ready\n" if status == 200 else b"warming up\n"
+        elif path == "/metrics":
+            status = 200
+            body = exposition().encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_started = False
+_server_lock = threading.Lock()
+
+
+def start_server(port=None, host="127.0.0.1"):
+    """Start the /metrics endpoint once per process; later calls are no-ops."""
+    global _server, _server_started
+    with _server_lock:
+        if _server_started:
+            return _server
+        _server_started = True
+        if port is None:
+            port = int(os.environ.get(PORT_ENV_VAR, DEFAULT_PORT))
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on %s:%s: %s", host, port, e)
+            return None
+        thread = threading.Thread(target=_server.serve_forever, name="metrics", daemon=True)
+        thread.start()
+        return _server
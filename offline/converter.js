@@ -0,0 +1,87 @@
+// converter.js
+// Client-side conversion over the table written by static_export.py. Each
+// unit has an affine (scale, offset) into its category's base unit, exactly
+// as in conversion.UnitRegistry, so the browser computes the same results
+// as the server with the same arithmetic.
+(function (root) {
+  "use strict";
+
+  // Scales, offsets and lower bounds travel as base64 little-endian float64
+  function decode(b64) {
+    var binary = typeof atob === "function"
+      ? atob(b64) : Buffer.from(b64, "base64").toString("binary");
+    var bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    return new Float64Array(bytes.buffer);
+  }
+
+  function UnitTable(data) {
+    this.units = data.units;
+    this.categories = data.categories.map(function (c) { return c[0]; });
+    this.options = {};
+    this.ids = {};
+    this.category = new Array(data.units.length);
+    for (var c = 0; c < data.categories.length; c++) {
+      var name = data.categories[c][0], members = data.categories[c][1];
+      this.options[name] = members.map(function (id) { return data.units[id]; });
+      for (var m = 0; m < members.length; m++) this.category[members[m]] = name;
+    }
+    for (var i = 0; i < data.units.length; i++) this.ids[data.units[i]] = i;
+    this.scales = decode(data.scales);
+    this.offsets = decode(data.offsets);
+    this.lower = decode(data.lower);
+    this.pairs = {};
+  }
+
+  UnitTable.prototype.id = function (unit) {
+    if (!Object.prototype.hasOwnProperty.call(this.ids, unit)) {
+      throw new Error("Unknown unit: " + unit);
+    }
+    return this.ids[unit];
+  };
+
+  // [scale, offset] so that converted = value * scale + offset
+  UnitTable.prototype.affine = function (from, to) {
+    var key = from + "\u0000" + to;
+    var cached = this.pairs[key];
+    if (cached) return cached;
+    var f = this.id(from), t = this.id(to);
+    if (this.category[f] !== this.category[t]) {
+      throw new Error("Cannot convert " + from + " (" + this.category[f] + ") to "
+                      + to + " (" + this.category[t] + ")");
+    }
+    var pair = f === t ? [1, 0] : [
+      this.scales[f] / this.scales[t],
+      (this.offsets[f] - this.offsets[t]) / this.scales[t]
+    ];
+    this.pairs[key] = pair;
+    return pair;
+  };
+
+  UnitTable.prototype.check = function (value, unit) {
+    var minimum = this.lower[this.id(unit)];
+    if (!(value >= minimum && value < Infinity)) {
+      var reason = isFinite(value)
+        ? "below the physical minimum of " + (Math.round(minimum * 1e6) / 1e6 + 0) + " " + unit
+        : "not a finite number";
+      throw new Error(value + " " + unit + " is " + reason);
+    }
+  };
+
+  UnitTable.prototype.convert = function (value, from, to) {
+    this.check(value, from);
+    var pair = this.affine(from, to);
+    return value * pair[0] + pair[1];
+  };
+
+  UnitTable.prototype.convertArray = function (values, from, to, out) {
+    var pair = this.affine(from, to), scale = pair[0], offset = pair[1];
+    out = out || new Float64Array(values.length);
+    for (var i = 0; i < values.length; i++) out[i] = values[i] * scale + offset;
+    return out;
+  };
+
+  UnitTable.decode = decode;
+  root.UnitTable = UnitTable;
+  if (typeof module !== "undefined" && module.exports) module.exports = UnitTable;
+})(typeof self !== "undefined" ? self : this);
@@ -0,0 +1,132 @@
+# pandas_accessor.py
+# Importing this module registers `.units` accessors on Series and DataFrame:
+#
+#     df["temp"].units.convert("Fahrenheit", "Celsius")
+#     df.units.convert({"temp": ("Fahrenheit", "Celsius"), "mass": "Kilogram"})
+#
+# A column's unit is carried in `attrs` ("unit" on a Series, a "units" dict
+# keyed by column on a DataFrame) so follow-up conversions are checked
+# against it and conversions to the same unit return the input untouched.
+import numpy as np
+import pandas as pd
+
+from auto_units import best_units
+from conversion import REGISTRY
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+
+def _convert_arrow(series, scale, offset):
+    # Stay inside Arrow: the chunked array is borrowed, not copied, and the
+    # compute kernels never materialize Python objects.
+    data = pa.array(series.array)
+    if not pa.types.is_floating(data.type):
+        data = pc.cast(data, pa.float64())
+    result = pc.multiply(data, pa.scalar(scale, data.type))
+    if offset:
+        result = pc.add(result, pa.scalar(offset, data.type))
+    return pd.arrays.ArrowExtensionArray(result)
+
+
+def _convert_numpy(series, scale, offset):
+    values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+    result = np.multiply(values, scale)
+    if offset:
+        np.add(result, offset, out=result)
+    return result
+
+
+@pd.api.extensions.register_series_accessor("units")
+class SeriesUnitsAccessor:
+    def __init__(self, series):
+        self._series = series
+
+    @property
+    def unit(self):
+        attrs = self._series.attrs
+        if "unit" in attrs:
+            return attrs["unit"]
+        return attrs.get("units", {}).get(self._series.name)
+
+    def set(self, unit):
+        REGISTRY.unit_id(unit)
+        series = self._series.copy(deep=False)
+        series.attrs["unit"] = unit
+        return series
+
+    def convert(self, from_unit, to_unit):
+        current = self.unit
+        if current is not None and current != from_unit:
+            raise ValueError(
+                f"Column {self._series.name!r} is in {current}, not {from_unit}"
+            )
+        scale, offset = REGISTRY.affine(from_unit, to_unit)
+        if from_unit == to_unit:
+            return self._series if current == to_unit else self.set(to_unit)
+
+        series = self._series
+        if pa is not None and isinstance(series.dtype, pd.ArrowDtype):
+            values = _convert_arrow(series, scale, offset)
+        else:
+            values = _convert_numpy(series, scale, offset)
+        result = pd.Series(values, index=series.index, name=series.name, copy=False)
+        result.attrs["unit"] = to_unit
+        return result
+
+    def to(self, to_unit):
+        if self.unit is None:
+            raise ValueError(f"Column {self._series.name!r} has no unit set")
+        return self.convert(self.unit, to_unit)
+
+    def readable(self):
+        """Re-express every value in its most readable unit, as value/unit columns."""
+        if self.unit is None:
+            raise ValueError(f"Column {self._series.name!r} has no unit set")
+        values, units = best_units(_convert_numpy(self._series, 1.0, 0.0), self.unit)
+        return pd.DataFrame(
+            {"value": values, "unit": pd.Categorical(units)}, index=self._series.index
+        )
+
+
+@pd.api.extensions.register_dataframe_accessor("units")
+class DataFrameUnitsAccessor:
+    def __init__(self, frame):
+        self._frame = frame
+
+    @property
+    def units(self):
+        return dict(self._frame.attrs.get("units", {}))
+
+    def set(self, units):
+        for unit in units.values():
+            REGISTRY.unit_id(unit)
+        frame = self._frame.copy(deep=False)
+        frame.attrs["units"] = {**self.units, **units}
+        return frame
+
+    def convert(self, conversions):
+        """Convert several columns at once.
+
+        `conversions` maps a column to either a `(from_unit, to_unit)` pair
+        or just the target unit when the column already carries one.
+        """
+        frame = self._frame.copy(deep=False)
+        units = self.units
+        for column, target in conversions.items():
+            series = self._frame[column]
+            if isinstance(target, str):
+                from_unit, to_unit = series.units.unit, target
+                if from_unit is None:
+                    raise ValueError(f"Column {column!r} has no unit set")
+            else:
+                from_unit, to_unit = target
+            converted = series.units.convert(from_unit, to_unit)
+            if from_unit != to_unit:
+                frame[column] = converted
+            units[column] = to_unit
+        frame.attrs["units"] = units
+        return frame
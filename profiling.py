@@ -0,0 +1,182 @@
+# profiling.py
+# Per-rerun timing for unit_converter.py. Profiling is switched on with the
+# `?profile=` query parameter or the UNIT_CONVERTER_PROFILE environment
+# variable: "1" records section timings only, "cprofile" additionally runs
+# cProfile over the whole rerun so it can be exported as a flame graph.
+import cProfile
+import marshal
+import os
+import pstats
+import time
+from contextlib import contextmanager, nullcontext
+
+ENV_VAR = "UNIT_CONVERTER_PROFILE"
+QUERY_PARAM = "profile"
+
+_SPAN_MODES = {"1", "true", "on", "spans"}
+_CPROFILE_MODES = {"cprofile", "full"}
+
+
+def profiling_mode(query_value=None):
+    value = (query_value or os.environ.get(ENV_VAR, "")).strip().lower()
+    if value in _CPROFILE_MODES:
+        return "cprofile"
+    if value in _SPAN_MODES:
+        return "spans"
+    return None
+
+
+class NullProfiler:
+    enabled = False
+
+    def section(self, name):
+        pass
+
+    def span(self, name):
+        return nullcontext()
+
+    def finish(self):
+        pass
+
+
+class RerunProfiler:
+    enabled = True
+
+    def __init__(self, capture=False):
+        self.spans = []
+        self.profile = None
+        self._section = None
+        self._started = time.perf_counter()
+        self.total = None
+        if capture:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self.profile = profile
+            except ValueError:
+                # Another session's rerun already holds the interpreter's profiler
+                pass
+
+    def _record(self, name, start, depth):
+        end = time.perf_counter()
+        self.spans.append((name, start - self._started, end - start, depth))
+
+    def section(self, name):
+        """End the current top-level section and start the next one."""
+        if self._section is not None:
+            self._record(*self._section, 0)
+        self._section = (name, time.perf_counter())
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, 1)
+
+    def finish(self):
+        if self.total is not None:
+            return
+        self.section(None)
+        self._section = None
+        self.total = time.perf_counter() - self._started
+        if self.profile is not None:
+            self.profile.disable()
+
+    def breakdown(self):
+        rows = sorted(self.spans, key=lambda span: span[1])
+        return [
+            {
+                "Section": ("    " * depth) + name,
+                "Start (ms)": round(start * 1000, 3),
+                "Duration (ms)": round(duration * 1000, 3),
+                "Share (%)": round(100 * duration / self.total, 1) if self.total else 0.0,
+            }
+            for name, start, duration, depth in rows
+        ]
+
+    def pstats_bytes(self):
+        """The cProfile data in the on-disk format read by pstats and snakeviz."""
+        if self.profile is None:
+            return None
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+    def folded_stacks(self, max_depth=48, max_paths=64):
+        """Collapsed-stack lines ("a;b;c <microseconds>"), the format produced
+        by `py-spy record --format raw` and read by flamegraph.pl/speedscope.
+
+        cProfile only keeps caller/callee edges, so each function's own time
+        is spread over its call paths in proportion to the time each caller
+        spent in it. Paths into each function are built once from its
+        callers' paths; a function keeps its `max_paths` heaviest paths and
+        the rest of its share goes to one "[other callers]" path. Recursion
+        is cut where a path would re-enter a function still being expanded.
+        """
+        if self.profile is None:
+            return ""
+        stats = pstats.Stats(self.profile).stats
+
+        def label(func):
+            filename, line, name = func
+            return f"{name} ({os.path.basename(filename)}:{line})"
+
+        # func -> [(stack, fraction)]; fractions of a function's paths sum to 1
+        memo = {}
+        expanding = set()
+
+        def paths(func):
+            if func in memo:
+                return memo[func]
+            own = label(func)
+            callers = {
+                caller: values[3]
+                for caller, values in stats.get(func, (0, 0, 0, 0, {}))[4].items()
+                if caller not in expanding and values[3] > 0
+            }
+            total = sum(callers.values())
+            if not callers or total <= 0:
+                return memo.setdefault(func, [((own,), 1.0)])
+            expanding.add(func)
+            try:
+                weights = {}
+                for caller, time_in in callers.items():
+                    share = time_in / total
+                    for stack, fraction in paths(caller):
+                        stack = (stack + (own,))[-max_depth:]
+                        weights[stack] = weights.get(stack, 0.0) + fraction * share
+            finally:
+                expanding.discard(func)
+            result = sorted(weights.items(), key=lambda item: -item[1])
+            if len(result) > max_paths:
+                rest = sum(fraction for _, fraction in result[max_paths - 1:])
+                result = result[:max_paths - 1] + [(("[other callers]", own), rest)]
+            memo[func] = result
+            return result
+
+        weights = {}
+        for func, (_, _, own_time, _, _) in stats.items():
+            if own_time <= 0:
+                continue
+            for stack, fraction in paths(func):
+                key = ";".join(stack)
+                weights[key] = weights.get(key, 0) + own_time * fraction
+        # Round with a running remainder so the lines add up to the profiled
+        # total; paths that round to 0 µs are dropped
+        lines = []
+        elapsed = emitted = 0
+        for stack, weight in sorted(weights.items()):
+            elapsed += weight
+            micros = round(elapsed * 1e6) - emitted
+            if micros > 0:
+                lines.append(f"{stack} {micros}")
+                emitted += micros
+        return "\n".join(lines)
+
+
+def start_profiler(query_value=None):
+    mode = profiling_mode(query_value)
+    if mode is None:
+        return NullProfiler()
+    return RerunProfiler(capture=mode == "cprofile")
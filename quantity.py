@@ -0,0 +1,397 @@
+# quantity.py
+# Value types over the unit registry. A Quantity is one number and a
+# QuantityArray is a NumPy buffer, each with a single integer unit ID, so
+# converting or combining them never builds unit strings or result tuples:
+#
+#     height = Quantity(5.9, "ft")
+#     height.to("cm")                     # Quantity(179.832, 'Centimeter')
+#     height + Quantity(2, "in")          # reconciled into feet
+#     QuantityArray([1, 2, 3], "kg").to("lb") > Quantity(3, "lb")
+#
+# Adding or subtracting operands in different offset units (Celsius and
+# Fahrenheit) is rejected, as in quantity_parser; comparisons convert the
+# right-hand side into the left-hand side's unit.
+#
+#     python quantity.py [--n 1000000]     memory and ops/s against the tuple API
+import argparse
+import numbers
+import operator
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from conversion import REGISTRY, ConversionError, UnknownUnit, convert_units, resolve_unit
+
+_UNIT_IDS = REGISTRY.unit_ids
+_UNIT_NAMES = REGISTRY.unit_names
+_CATEGORY_CODES = REGISTRY.category_codes.tolist()
+# (from ID, to ID) -> (scale, offset)
+_AFFINE = {}
+
+
+def unit_id(unit):
+    """Registry ID for a unit ID, name or alias ("ft", "kg")."""
+    if type(unit) is int or (isinstance(unit, numbers.Integral) and not isinstance(unit, bool)):
+        unit = int(unit)
+        if not 0 <= unit < len(_UNIT_NAMES):
+            raise UnknownUnit(f"#{unit}")
+        return unit
+    if not isinstance(unit, str):
+        raise UnknownUnit(repr(unit))
+    try:
+        return _UNIT_IDS[unit]
+    except KeyError:
+        return REGISTRY.unit_id(resolve_unit(unit))
+
+
+def _affine(from_id, to_id):
+    try:
+        return _AFFINE[from_id, to_id]
+    except KeyError:
+        pair = _AFFINE[from_id, to_id] = REGISTRY.affine(_UNIT_NAMES[from_id], _UNIT_NAMES[to_id])
+        return pair
+
+
+def _cross_category(left, right, op):
+    """Result of == or != between quantities of different categories (a
+    length never equals a mass); None when the comparison goes ahead."""
+    if _CATEGORY_CODES[left.unit_id] == _CATEGORY_CODES[right.unit_id]:
+        return None
+    if op is not operator.eq and op is not operator.ne:
+        # Ordering a length against a mass raises IncompatibleCategory
+        return None
+    result = op is operator.ne
+    if isinstance(left, QuantityArray) or isinstance(right, QuantityArray):
+        return np.full(np.broadcast_shapes(np.shape(left.value), np.shape(right.value)), result)
+    return result
+
+
+def _additive(from_id, to_id):
+    """Scale for bringing an addend into another unit; offsets don't add."""
+    scale, offset = _affine(from_id, to_id)
+    if offset:
+        raise ConversionError(f"Cannot add {_UNIT_NAMES[from_id]} to {_UNIT_NAMES[to_id]}")
+    return scale
+
+
+class Quantity:
+    __slots__ = ("value", "unit_id")
+
+    def __init__(self, value, unit):
+        self.value = value
+        self.unit_id = unit_id(unit)
+
+    @classmethod
+    def _make(cls, value, unit_id):
+        quantity = object.__new__(cls)
+        quantity.value = value
+        quantity.unit_id = unit_id
+        return quantity
+
+    @classmethod
+    def parse(cls, text):
+        """Build a Quantity from text such as "5 ft 11 in" or "3.2e4 g"."""
+        from quantity_parser import parse_quantity
+        value, unit = parse_quantity(text)
+        if unit is None:
+            raise ConversionError(f"{text!r} has no unit")
+        return cls._make(value, _UNIT_IDS[unit])
+
+    @property
+    def unit(self):
+        return _UNIT_NAMES[self.unit_id]
+
+    @property
+    def category(self):
+        return REGISTRY.unit_category[_UNIT_NAMES[self.unit_id]]
+
+    def to(self, unit):
+        to_id = unit_id(unit)
+        scale, offset = _affine(self.unit_id, to_id)
+        return Quantity._make(self.value * scale + offset, to_id)
+
+    def _in_my_unit(self, other):
+        if other.unit_id == self.unit_id:
+            return other.value
+        scale, offset = _affine(other.unit_id, self.unit_id)
+        return other.value * scale + offset
+
+    def __add__(self, other):
+        if isinstance(other, QuantityArray):
+            return QuantityArray._make(self.value + other.values * _additive(other.unit_id, self.unit_id),
+                                       self.unit_id)
+        if not isinstance(other, Quantity):
+            return NotImplemented
+        if other.unit_id == self.unit_id:
+            return Quantity._make(self.value + other.value, self.unit_id)
+        return Quantity._make(self.value + other.value * _additive(other.unit_id, self.unit_id),
+                              self.unit_id)
+
+    def __radd__(self, other):
+        # Lets sum() start from its default 0
+        if type(other) is int and other == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, other):
+        if not isinstance(other, (Quantity, QuantityArray)):
+            return NotImplemented
+        return self + -other
+
+    def __mul__(self, factor):
+        if isinstance(factor, (Quantity, QuantityArray)):
+            return NotImplemented
+        return Quantity._make(self.value * factor, self.unit_id)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, (Quantity, QuantityArray)):
+            # Ratio of two lengths, masses, ...: a plain number
+            return self.value / (other.value * _additive(other.unit_id, self.unit_id))
+        return Quantity._make(self.value / other, self.unit_id)
+
+    def __neg__(self):
+        return Quantity._make(-self.value, self.unit_id)
+
+    def __abs__(self):
+        return Quantity._make(abs(self.value), self.unit_id)
+
+    def _compare(self, other, op):
+        if not isinstance(other, (Quantity, QuantityArray)):
+            return NotImplemented
+        result = _cross_category(self, other, op)
+        if result is not None:
+            return result
+        if isinstance(other, QuantityArray):
+            return op(self.value, other.to(self.unit_id).values)
+        return op(self.value, self._in_my_unit(other))
+
+    def __eq__(self, other):
+        return self._compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._compare(other, operator.ne)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    # Equal quantities can have different values (1 m == 100 cm)
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Quantity({self.value!r}, {self.unit!r})"
+
+    def __str__(self):
+        return f"{self.value} {self.unit}"
+
+    def __format__(self, spec):
+        return f"{format(self.value, spec)} {self.unit}"
+
+
+class QuantityArray:
+    """A NumPy array of values sharing one unit. float32 arrays stay float32."""
+
+    __slots__ = ("values", "unit_id")
+
+    def __init__(self, values, unit):
+        values = np.asarray(values)
+        if values.dtype.kind != "f":
+            values = values.astype(np.float64)
+        self.values = values
+        self.unit_id = unit_id(unit)
+
+    @classmethod
+    def _make(cls, values, unit_id):
+        array = object.__new__(cls)
+        array.values = values
+        array.unit_id = unit_id
+        return array
+
+    @property
+    def value(self):
+        return self.values
+
+    unit = Quantity.unit
+    category = Quantity.category
+
+    def to(self, unit):
+        to_id = unit_id(unit)
+        if to_id == self.unit_id:
+            return self
+        return QuantityArray._make(
+            REGISTRY.convert_array(self.values, _UNIT_NAMES[self.unit_id], _UNIT_NAMES[to_id]), to_id
+        )
+
+    def check(self):
+        """Raise OutOfRange for NaN, infinite or physically impossible values."""
+        REGISTRY.check(self.values, self.unit)
+        return self
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        values = self.values[index]
+        if np.ndim(values) == 0:
+            return Quantity._make(values.item(), self.unit_id)
+        return QuantityArray._make(values, self.unit_id)
+
+    def __iter__(self):
+        unit = self.unit_id
+        return (Quantity._make(value, unit) for value in self.values.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def _in_my_unit(self, other):
+        if other.unit_id == self.unit_id:
+            return other.value
+        if isinstance(other, QuantityArray):
+            return other.to(self.unit_id).values
+        scale, offset = _affine(other.unit_id, self.unit_id)
+        return other.value * scale + offset
+
+    def __add__(self, other):
+        if not isinstance(other, (Quantity, QuantityArray)):
+            return NotImplemented
+        if other.unit_id == self.unit_id:
+            return QuantityArray._make(self.values + other.value, self.unit_id)
+        return QuantityArray._make(
+            self.values + other.value * _additive(other.unit_id, self.unit_id), self.unit_id
+        )
+
+    __radd__ = Quantity.__radd__
+    __sub__ = Quantity.__sub__
+
+    def __mul__(self, factor):
+        if isinstance(factor, (Quantity, QuantityArray)):
+            return NotImplemented
+        return QuantityArray._make(self.values * factor, self.unit_id)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, (Quantity, QuantityArray)):
+            return self.values / (other.value * _additive(other.unit_id, self.unit_id))
+        return QuantityArray._make(self.values / other, self.unit_id)
+
+    def __neg__(self):
+        return QuantityArray._make(-self.values, self.unit_id)
+
+    def __abs__(self):
+        return QuantityArray._make(np.abs(self.values), self.unit_id)
+
+    def _compare(self, other, op):
+        if not isinstance(other, (Quantity, QuantityArray)):
+            return NotImplemented
+        result = _cross_category(self, other, op)
+        if result is not None:
+            return result
+        return op(self.values, self._in_my_unit(other))
+
+    __eq__ = Quantity.__eq__
+    __ne__ = Quantity.__ne__
+    __lt__ = Quantity.__lt__
+    __le__ = Quantity.__le__
+    __gt__ = Quantity.__gt__
+    __ge__ = Quantity.__ge__
+    __hash__ = None
+
+    def sum(self):
+        return Quantity._make(float(self.values.sum()), self.unit_id)
+
+    def mean(self):
+        return Quantity._make(float(self.values.mean()), self.unit_id)
+
+    def min(self):
+        return Quantity._make(float(self.values.min()), self.unit_id)
+
+    def max(self):
+        return Quantity._make(float(self.values.max()), self.unit_id)
+
+    def __repr__(self):
+        return f"QuantityArray({self.values!r}, {self.unit!r})"
+
+    def __str__(self):
+        return f"{self.values} {self.unit}"
+
+    def __format__(self, spec):
+        if not spec:
+            return str(self)
+        text = np.array2string(self.values, formatter={"float_kind": lambda v: format(v, spec)})
+        return f"{text} {self.unit}"
+
+
+def _memory_per_item(build, n):
+    tracemalloc.start()
+    items = build(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return size / n
+
+
+def _rate(func, n):
+    started = time.perf_counter()
+    func(n)
+    return n / (time.perf_counter() - started)
+
+
+def benchmark(n=1_000_000):
+    values = np.random.default_rng(0).uniform(0, 1000, n).tolist()
+    meter = _UNIT_IDS["Meter"]
+    foot = _UNIT_IDS["Foot"]
+
+    memory = {
+        "(value, from, to, category) tuple": _memory_per_item(
+            lambda n: [(values[i], "Meter", "Foot", "Length") for i in range(n)], n),
+        "(result, formula) from convert_units": _memory_per_item(
+            lambda n: [convert_units(values[i], "Meter", "Foot", "Length") for i in range(n)], n),
+        "Quantity": _memory_per_item(
+            lambda n: [Quantity._make(values[i], meter) for i in range(n)], n),
+        "QuantityArray (per value)": _memory_per_item(
+            lambda n: QuantityArray(np.array(values[:n]), meter), n),
+    }
+    quantities = [Quantity._make(v, meter) for v in values]
+    array = QuantityArray(np.array(values), meter)
+    rates = {
+        "convert_units(v, 'Meter', 'Foot', 'Length')": _rate(
+            lambda n: [convert_units(v, "Meter", "Foot", "Length") for v in values[:n]], n),
+        "Quantity.to('Foot')": _rate(lambda n: [q.to("Foot") for q in quantities[:n]], n),
+        "Quantity.to(foot_id)": _rate(lambda n: [q.to(foot) for q in quantities[:n]], n),
+        "Quantity + Quantity (mixed units)": _rate(
+            lambda n: [q + Quantity._make(1.0, foot) for q in quantities[:n]], n),
+        "Quantity < Quantity (mixed units)": _rate(
+            lambda n: [q < Quantity._make(1.0, foot) for q in quantities[:n]], n),
+        "QuantityArray.to('Foot') (per value)": _rate(lambda n: array.to("Foot"), n),
+    }
+    print(f"Memory per item, {n:,} items:")
+    for name, size in memory.items():
+        print(f"  {name:<44} {size:8.1f} bytes")
+    print("Throughput:")
+    for name, rate in rates.items():
+        print(f"  {name:<44} {rate / 1e6:8.2f}M ops/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Quantity against the tuple API")
+    parser.add_argument("--n", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+    benchmark(args.n)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# quantity_parser.py
+# Free-text quantities such as "5 ft 11 in", "3.2e4 g" or "(100-32)*5/9".
+# Each number-and-operator run is validated against a small arithmetic-only
+# AST whitelist and compiled once; compiled expressions and whole parses are
+# cached, so retyping or editing an input only compiles the changed part.
+import ast
+import math
+import re
+from functools import lru_cache
+
+from conversion import REGISTRY, ConversionError, resolve_unit
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+      | (?P<operator>\*\*|[-+*/%()])
+      | (?P<unit>°?[A-Za-z]+|["'])
+    )""", re.VERBOSE)
+
+# Longer input is rejected before parsing; deeply nested expressions exhaust
+# the parser's recursion limit and memory
+MAX_LENGTH = 200
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+)
+
+
+class QuantityParseError(ConversionError, ValueError):
+    pass
+
+
+class _FloatConstants(ast.NodeTransformer):
+    # Float arithmetic overflows quickly instead of building huge integers
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+@lru_cache(maxsize=4096)
+def compile_expression(text):
+    """Validate an arithmetic expression and return its compiled code."""
+    if len(text) > MAX_LENGTH:
+        raise QuantityParseError(f"Expression longer than {MAX_LENGTH} characters")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError:
+        raise QuantityParseError(f"Invalid expression: {text}") from None
+    except (RecursionError, MemoryError):
+        raise QuantityParseError("Expression is nested too deeply") from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise QuantityParseError(f"Unsupported syntax in expression: {text}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise QuantityParseError(f"Unsupported constant in expression: {text}")
+    try:
+        tree = ast.fix_missing_locations(_FloatConstants().visit(tree))
+        return compile(tree, "<quantity>", "eval")
+    except (RecursionError, MemoryError):
+        raise QuantityParseError("Expression is nested too deeply") from None
+
+
+def evaluate_expression(text):
+    code = compile_expression(text)
+    try:
+        value = eval(code, {"__builtins__": {}})
+    except (ArithmeticError, ValueError) as e:
+        raise QuantityParseError(f"Cannot evaluate {text}: {e}") from None
+    # A negative number to a fractional power, e.g. (-8)**(1/3), is complex
+    if isinstance(value, complex):
+        raise QuantityParseError(f"{text} has no real value")
+    if not math.isfinite(value):
+        raise QuantityParseError(f"Cannot evaluate {text}: result out of range")
+    return float(value)
+
+
+def _split_terms(text):
+    terms = []
+    expression = []
+    position = 0
+    text = text.strip()
+    if len(text) > MAX_LENGTH:
+        raise QuantityParseError(f"Quantity longer than {MAX_LENGTH} characters")
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise QuantityParseError(f"Unexpected input at {text[position:]!r}")
+        position = match.end()
+        if match.group("unit"):
+            if not expression:
+                raise QuantityParseError(f"Unit {match.group('unit')!r} has no value")
+            terms.append((" ".join(expression), resolve_unit(match.group("unit"))))
+            expression = []
+        else:
+            expression.append(match.group("number") or match.group("operator"))
+    if expression:
+        terms.append((" ".join(expression), None))
+    if not terms:
+        raise QuantityParseError("Empty quantity")
+    return terms
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(text):
+    """Parse text into (value, unit); unit is None for a bare number or expression.
+
+    Several terms with units ("5 ft 11 in") are added together and expressed
+    in the first term's unit.
+    """
+    terms = _split_terms(text)
+    if len(terms) > 1 and any(unit is None for _, unit in terms):
+        raise QuantityParseError(f"Every part of {text!r} needs a unit")
+    value_unit = terms[0][1]
+    value = 0.0
+    for expression, unit in terms:
+        amount = evaluate_expression(expression)
+        if unit is not None and unit != value_unit:
+            scale, offset = REGISTRY.affine(unit, value_unit)
+            if offset:
+                raise QuantityParseError(f"Cannot add {unit} to {value_unit}")
+            amount *= scale
+        value += amount
+    return value, value_unit
@@ -0,0 +1,109 @@
+# rate_tables.py
+# Conversion factors that change over time (currency-style rates). Each unit
+# pair has a versioned table: sorted effective dates with the factor that
+# applies from that date on. A batch of (timestamp, value) pairs is converted
+# with one binary search over the effective dates for the whole batch.
+#
+# Rates are read from local CSV files only, one row per version:
+#
+#     effective_date,from_unit,to_unit,factor
+#     2026-01-01,USD,EUR,0.91
+#     2026-02-01,USD,EUR,0.92
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+RATE_COLUMNS = ["effective_date", "from_unit", "to_unit", "factor"]
+
+
+def _to_ns(timestamps):
+    return pd.to_datetime(np.asarray(timestamps)).to_numpy("datetime64[ns]").view(np.int64)
+
+
+class FactorTable:
+    def __init__(self, from_unit, to_unit, effective, factors):
+        effective = _to_ns(effective)
+        factors = np.asarray(factors, dtype=np.float64)
+        # Stable sort, then keep the last version listed for any repeated date
+        order = np.argsort(effective, kind="stable")
+        effective, factors = effective[order], factors[order]
+        last = np.append(effective[1:] != effective[:-1], True)
+        self.from_unit = from_unit
+        self.to_unit = to_unit
+        self.effective = effective[last]
+        self.factors = factors[last]
+
+    def __len__(self):
+        return len(self.effective)
+
+    def inverse(self):
+        return FactorTable(self.to_unit, self.from_unit,
+                           self.effective.view("datetime64[ns]"), 1 / self.factors)
+
+    def factors_at(self, timestamps):
+        """Factor in effect at each timestamp."""
+        index = np.searchsorted(self.effective, _to_ns(timestamps), side="right") - 1
+        if len(index) and index.min() < 0:
+            early = int((index < 0).sum())
+            first = pd.Timestamp(self.effective[0])
+            raise ValueError(
+                f"{early} timestamp(s) precede the first {self.from_unit}->{self.to_unit} "
+                f"rate (effective {first})"
+            )
+        return self.factors[index]
+
+    def convert(self, timestamps, values):
+        return np.asarray(values, dtype=np.float64) * self.factors_at(timestamps)
+
+
+class RateBook:
+    """All factor tables loaded from a set of rate files, looked up by unit pair.
+    A pair is also available in reverse through the inverted table."""
+
+    def __init__(self, tables=()):
+        self.tables = {}
+        for table in tables:
+            self.add(table)
+
+    def add(self, table):
+        self.tables[(table.from_unit, table.to_unit)] = table
+
+    def table(self, from_unit, to_unit):
+        table = self.tables.get((from_unit, to_unit))
+        if table is None:
+            reverse = self.tables.get((to_unit, from_unit))
+            if reverse is None:
+                raise KeyError(f"No rates for {from_unit} -> {to_unit}")
+            table = self.tables[(from_unit, to_unit)] = reverse.inverse()
+        return table
+
+    def convert(self, timestamps, values, from_unit, to_unit):
+        if from_unit == to_unit:
+            return np.asarray(values, dtype=np.float64).copy()
+        return self.table(from_unit, to_unit).convert(timestamps, values)
+
+    @classmethod
+    def from_frame(cls, frame):
+        missing = set(RATE_COLUMNS) - set(frame.columns)
+        if missing:
+            raise ValueError(f"Rate file is missing columns: {', '.join(sorted(missing))}")
+        book = cls()
+        for (from_unit, to_unit), rows in frame.groupby(["from_unit", "to_unit"], sort=False):
+            book.add(FactorTable(from_unit, to_unit, rows["effective_date"], rows["factor"]))
+        return book
+
+    @classmethod
+    def load(cls, *paths):
+        """Load rate CSVs; directories contribute every *.csv file inside them."""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(sorted(glob.glob(os.path.join(path, "*.csv"))))
+            else:
+                files.append(path)
+        if not files:
+            return cls()
+        frame = pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+        return cls.from_frame(frame)
@@ -0,0 +1,200 @@
+# registry_check.py
+# Correctness and performance sweep over every (category, from, to) pair in
+# the registry. Pairs are generated from REGISTRY, so newly added units are
+# covered without touching this file.
+#
+# For random values across many magnitudes (plus edge cases) it checks:
+#   - round trip:    from -> to -> from gives back the input
+#   - transitivity:  from -> via -> to agrees with from -> to for every via
+#   - path agreement: convert_units (scalar), REGISTRY.convert_array (batch),
+#                    async_api.convert_batch (parallel, executor-backed) and
+#                    convert_exact (Fraction) all give the same answer
+#   - float32:       the float32 batch path stays within float32_error_bound
+# and times each path per value. --bandwidth N also times float32 against
+# float64 on N-element arrays, where memory traffic dominates.
+#
+#     python registry_check.py [--samples 200] [--batch 200000] [--seed 0] [--bandwidth 0]
+import argparse
+import asyncio
+import math
+import sys
+import time
+from itertools import product
+
+import numpy as np
+
+import async_api
+from conversion import EXACT_UNITS, REGISTRY, convert_exact, convert_units
+
+# Relative tolerance between float paths, and against the exact path
+RTOL = 1e-12
+# Absolute slack for results that land on or near zero (32 F -> 0 C)
+ATOL = 1e-9
+
+
+def unit_pairs():
+    for from_unit, to_unit in product(REGISTRY.unit_names, repeat=2):
+        category = REGISTRY.unit_category[from_unit]
+        if category == REGISTRY.unit_category[to_unit]:
+            yield category, from_unit, to_unit
+
+
+def sample_values(rng, unit, n):
+    """Log-uniform magnitudes from 1e-6 to 1e9 plus edge cases, all valid for unit."""
+    minimum = REGISTRY.lower_bounds[REGISTRY.unit_id(unit)]
+    values = 10.0 ** rng.uniform(-6, 9, n)
+    if np.isfinite(minimum) and minimum < 0:
+        # Offset scales may go negative down to their physical minimum
+        values = np.concatenate((values, rng.uniform(minimum, 0, n // 4)))
+    edges = [0.0, 1.0, 1e-12, 1e12]
+    if np.isfinite(minimum):
+        edges.append(round(float(minimum), 6) + 1e-6)
+    return np.concatenate((values, edges))
+
+
+def close(a, b, rtol=RTOL, atol=ATOL):
+    return np.isclose(a, b, rtol=rtol, atol=atol)
+
+
+def check_pair(rng, category, from_unit, to_unit, samples):
+    failures = []
+    values = sample_values(rng, from_unit, samples)
+
+    batch = REGISTRY.convert_array(values, from_unit, to_unit)
+    back = REGISTRY.convert_array(batch, to_unit, from_unit)
+    bad = ~close(back, values)
+    if bad.any():
+        failures.append(f"round trip off for {values[bad][:3]}")
+
+    for via in REGISTRY.unit_names:
+        if REGISTRY.unit_category[via] != category:
+            continue
+        chained = REGISTRY.convert_array(
+            REGISTRY.convert_array(values, from_unit, via), via, to_unit
+        )
+        bad = ~close(chained, batch)
+        if bad.any():
+            failures.append(f"not transitive via {via} for {values[bad][:3]}")
+
+    scalar = np.array([convert_units(float(v), from_unit, to_unit, category)[0] for v in values])
+    bad = ~close(scalar, batch)
+    if bad.any():
+        failures.append(f"scalar and batch paths disagree for {values[bad][:3]}")
+
+    # Large enough to be offloaded and split into several chunks, the last one partial
+    spread = np.resize(values, 3 * async_api.CHUNK_SIZE + 7)
+    parallel = asyncio.run(async_api.convert_batch(spread, from_unit, to_unit))
+    bad = ~close(parallel, REGISTRY.convert_array(spread, from_unit, to_unit))
+    if bad.any():
+        failures.append(f"parallel and batch paths disagree for {spread[bad][:3]}")
+
+    values32 = values.astype(np.float32)
+    result32 = REGISTRY.convert_array(values32, from_unit, to_unit)
+    reference = REGISTRY.convert_array(values32.astype(np.float64), from_unit, to_unit)
+    rel, abs_ = REGISTRY.float32_error_bound(from_unit, to_unit)
+    bad = ~(np.abs(result32 - reference) <= rel * np.abs(reference) + abs_)
+    if result32.dtype != np.float32 or bad.any():
+        failures.append(f"float32 path outside its error bound for {values32[bad][:3]}")
+
+    if from_unit in EXACT_UNITS and to_unit in EXACT_UNITS:
+        exact = np.array([float(convert_exact(float(v), from_unit, to_unit)) for v in values])
+        bad = ~close(batch, exact)
+        if bad.any():
+            worst = np.max(np.abs(batch - exact) / np.maximum(np.abs(exact), ATOL))
+            failures.append(f"off from the exact result by up to {worst:.2e} (relative)")
+    return failures
+
+
+def time_paths(rng, category, from_unit, to_unit, batch_size):
+    values = sample_values(rng, from_unit, batch_size)
+    scalar_values = values[:2000].tolist()
+    timings = {}
+
+    started = time.perf_counter()
+    for v in scalar_values:
+        convert_units(v, from_unit, to_unit, category)
+    timings["scalar"] = (time.perf_counter() - started) / len(scalar_values)
+
+    started = time.perf_counter()
+    REGISTRY.convert_array(values, from_unit, to_unit)
+    timings["batch"] = (time.perf_counter() - started) / len(values)
+
+    values32 = values.astype(np.float32)
+    started = time.perf_counter()
+    REGISTRY.convert_array(values32, from_unit, to_unit)
+    timings["float32"] = (time.perf_counter() - started) / len(values)
+
+    started = time.perf_counter()
+    asyncio.run(async_api.convert_batch(values, from_unit, to_unit))
+    timings["parallel"] = (time.perf_counter() - started) / len(values)
+
+    if from_unit in EXACT_UNITS and to_unit in EXACT_UNITS:
+        exact_values = scalar_values[:200]
+        started = time.perf_counter()
+        for v in exact_values:
+            convert_exact(v, from_unit, to_unit)
+        timings["exact"] = (time.perf_counter() - started) / len(exact_values)
+    return timings
+
+
+def bandwidth(size, repeats=5):
+    """Best-of-`repeats` GB/s (bytes read + written) per dtype, on arrays
+    large enough to stream from memory."""
+    rng = np.random.default_rng(0)
+    print(f"{size:,} values, best of {repeats}:")
+    for from_unit, to_unit in (("Meter", "Foot"), ("Fahrenheit", "Celsius")):
+        rates = {}
+        for dtype in (np.float64, np.float32):
+            values = rng.uniform(0, 1000, size).astype(dtype)
+            out = np.empty_like(values)
+            best = min(
+                _timed(REGISTRY.convert_array, values, from_unit, to_unit, out)
+                for _ in range(repeats)
+            )
+            rates[dtype] = best
+            print(f"  {from_unit} -> {to_unit} {np.dtype(dtype).name:<8} {best * 1e3:8.1f} ms  "
+                  f"{2 * values.nbytes / best / 1e9:6.1f} GB/s  {size / best / 1e6:7.0f}M values/s")
+        print(f"  float32 speedup: {rates[np.float64] / rates[np.float32]:.2f}x")
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def _ns(seconds):
+    return "-" if seconds is None or math.isnan(seconds) else f"{seconds * 1e9:,.1f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and time every unit pair in the registry")
+    parser.add_argument("--samples", type=int, default=200, help="random values per pair")
+    parser.add_argument("--batch", type=int, default=200_000, help="values per timed batch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bandwidth", type=int, default=0,
+                        help="also time float32 against float64 on arrays of this size")
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+
+    failed = 0
+    pairs = list(unit_pairs())
+    print(f"{'pair':<28} {'scalar ns':>10} {'batch ns':>10} {'float32 ns':>11} "
+          f"{'parallel ns':>12} {'exact ns':>10}  result")
+    for category, from_unit, to_unit in pairs:
+        failures = check_pair(rng, category, from_unit, to_unit, args.samples)
+        timings = time_paths(rng, category, from_unit, to_unit, args.batch)
+        failed += bool(failures)
+        print(
+            f"{from_unit + ' -> ' + to_unit:<28} {_ns(timings['scalar']):>10} "
+            f"{_ns(timings['batch']):>10} {_ns(timings['float32']):>11} {_ns(timings['parallel']):>12} "
+            f"{_ns(timings.get('exact')):>10}  {'; '.join(failures) or 'ok'}"
+        )
+    print(f"{len(pairs)} pairs checked, {failed} failing")
+    if args.bandwidth:
+        bandwidth(args.bandwidth)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+# session_store.py
+# Shared storage for per-user state (history and unit selection) so that any
+# replica behind a load balancer can pick a session up. Reruns only touch the
+# in-process copy in st.session_state: state is read from the backend once
+# when a session starts and written back asynchronously in batches.
+#
+# The backend is chosen with UNIT_CONVERTER_SESSION_STORE:
+#   memory                      process-local stand-in (the default)
+#   sqlite:///path/to/state.db  a SQLite file shared by all replicas
+#
+# Sessions not written for UNIT_CONVERTER_SESSION_TTL seconds (default one
+# day) expire, so neither backend grows with every session ever served.
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+STORE_ENV_VAR = "UNIT_CONVERTER_SESSION_STORE"
+TTL_ENV_VAR = "UNIT_CONVERTER_SESSION_TTL"
+DEFAULT_TTL = 24 * 3600
+
+# Expired rows are purged from SQLite at most this often
+PURGE_INTERVAL = 60
+
+logger = logging.getLogger(__name__)
+
+# Payloads above this size are zlib-compressed
+COMPRESS_THRESHOLD = 512
+
+_PLAIN = b"j"
+_COMPRESSED = b"z"
+
+
+def dumps(state):
+    data = json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode()
+    if len(data) > COMPRESS_THRESHOLD:
+        return _COMPRESSED + zlib.compress(data)
+    return _PLAIN + data
+
+
+def loads(blob):
+    blob = bytes(blob)
+    tag, data = blob[:1], blob[1:]
+    if tag == _COMPRESSED:
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+
+class MemoryBackend:
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        # key -> (blob, updated), oldest write first
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[1] < time.time() - self.ttl:
+            return None
+        return entry[0]
+
+    def save_many(self, items):
+        now = time.time()
+        with self._lock:
+            for key, blob in items.items():
+                self._data[key] = (blob, now)
+                self._data.move_to_end(key)
+            expired = now - self.ttl
+            while self._data and next(iter(self._data.values()))[1] < expired:
+                self._data.popitem(last=False)
+
+
+class SQLiteBackend:
+    def __init__(self, path, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)"
+            )
+
+    def load(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM sessions WHERE key = ? AND updated >= ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, items):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO sessions (key, value, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "updated = excluded.updated",
+                [(key, value, now) for key, value in items.items()]
+            )
+            if now - self._last_purge >= PURGE_INTERVAL:
+                self._last_purge = now
+                self._conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,))
+
+
+class SessionStore:
+    """Write-behind front for a backend.
+
+    `put` only records the latest state for a key; a background thread
+    serializes and writes everything dirty in one batch every
+    `flush_interval` seconds, so repeated updates to one session between
+    flushes cost a single write.
+    """
+
+    def __init__(self, backend, flush_interval=0.5):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self._dirty = {}
+        # The batch being written; still the newest state for its keys
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="session-store", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._dirty:
+                return self._dirty[key]
+            if key in self._flushing:
+                return self._flushing[key]
+        blob = self.backend.load(key)
+        return None if blob is None else loads(blob)
+
+    def put(self, key, state):
+        with self._lock:
+            self._dirty[key] = state
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._flushing = dirty
+        if not dirty:
+            return
+        try:
+            self.backend.save_many({key: dumps(state) for key, state in dirty.items()})
+        except Exception:
+            # Puts only happen on change, so nothing would write these again:
+            # re-queue them, unless a newer state was put meanwhile
+            with self._lock:
+                for key, state in dirty.items():
+                    self._dirty.setdefault(key, state)
+            raise
+        finally:
+            with self._lock:
+                self._flushing = {}
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the thread alive; flush() re-queued the batch for the next try
+                logger.exception("Session store flush failed")
+
+
+def open_backend(spec, ttl=DEFAULT_TTL):
+    if not spec or spec == "memory":
+        return MemoryBackend(ttl)
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):], ttl)
+    raise ValueError(f"Unknown session store: {spec}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            ttl = float(os.environ.get(TTL_ENV_VAR, DEFAULT_TTL))
+            _store = SessionStore(open_backend(os.environ.get(STORE_ENV_VAR), ttl))
+        return _store
@@ -0,0 +1,235 @@
+# static_export.py
+# Offline build of the converter. The compiled registry is exported as a
+# compact table (unit names plus base64 float64 scale/offset/bound arrays)
+# next to a small JavaScript converter, so conversions run in the browser
+# with no server round trip. The server is only needed to sync history.
+#
+#     python static_export.py build [--out dist/offline]
+#         index.html (self-contained, works from file://), converter.js and
+#         registry.json for other clients
+#     python static_export.py serve [--out dist/offline] [--port 8502]
+#         serves the build and accepts history sync at POST /history?sid=...
+#     python static_export.py measure [--conversions 10]
+#         server requests per session: Streamlit app against the static page
+#
+# Synced history lands in the session store under the page's session ID, so
+# with a shared store (UNIT_CONVERTER_SESSION_STORE=sqlite:///...) opening
+# the Streamlit app with ?sid=<id> shows the same history.
+import argparse
+import base64
+import json
+import math
+import os
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from conversion import CONVERSION_FACTORS, REGISTRY, source_digest
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(APP_DIR, "offline")
+DEFAULT_OUT = os.path.join(APP_DIR, "dist", "offline")
+TABLE_FORMAT = 1
+
+# Largest accepted sync payload
+MAX_SYNC_BYTES = 4 * 1024 * 1024
+
+# Syncs for one session ID run one at a time (the page's periodic sync and
+# its pagehide beacon can carry the same rows); IDs share a fixed set of locks
+_SYNC_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _b64(array):
+    return base64.b64encode(np.ascontiguousarray(array, dtype="<f8").tobytes()).decode()
+
+
+def export_table(registry=REGISTRY):
+    """The registry as a JSON-ready dict: unit IDs per category plus the
+    scale, offset and lower-bound arrays indexed by unit ID."""
+    members = {category: [] for category in registry.categories}
+    for unit in registry.unit_names:
+        members[registry.unit_category[unit]].append(registry.unit_ids[unit])
+    return {
+        "format": TABLE_FORMAT,
+        "digest": source_digest(CONVERSION_FACTORS).hex(),
+        "categories": [[category, ids] for category, ids in members.items()],
+        "units": registry.unit_names,
+        "scales": _b64(registry.scales),
+        "offsets": _b64(registry.offsets),
+        "lower": _b64(registry.lower_bounds),
+    }
+
+
+def build(out_dir=DEFAULT_OUT, registry=REGISTRY):
+    """Write the offline build; returns {file name: size in bytes}."""
+    table = json.dumps(export_table(registry), separators=(",", ":"))
+    with open(os.path.join(TEMPLATE_DIR, "converter.js"), encoding="utf-8") as f:
+        converter = f.read()
+    with open(os.path.join(TEMPLATE_DIR, "index.html"), encoding="utf-8") as f:
+        page = f.read()
+    page = page.replace("/*@CONVERTER@*/", converter).replace("/*@TABLE@*/null", table)
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = {"index.html": page, "converter.js": converter, "registry.json": table}
+    for name, content in outputs.items():
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            f.write(content)
+    return {name: len(content.encode()) for name, content in outputs.items()}
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _history_rows(columns):
+    """Rows of posted history columns; ValueError unless every row is well formed."""
+    from history import COLUMNS
+
+    if not isinstance(columns, dict) or not all(isinstance(columns.get(name), list) for name in COLUMNS):
+        raise ValueError("Expected a list per history column")
+    if len({len(columns[name]) for name in COLUMNS}) != 1:
+        raise ValueError("History columns differ in length")
+    rows = list(zip(*(columns[name] for name in COLUMNS)))
+    for timestamp, category, from_unit, to_unit, value, result, text in rows:
+        if category not in REGISTRY.categories:
+            raise ValueError(f"Unknown category {category!r}")
+        for unit in (from_unit, to_unit):
+            if REGISTRY.unit_category.get(unit) != category:
+                raise ValueError(f"{unit!r} is not a {category} unit")
+        if not (_number(timestamp) and _number(value) and _number(result) and isinstance(text, str)):
+            raise ValueError("Malformed history row")
+    return rows
+
+
+def sync_history(session_id, columns):
+    """Append history rows posted by the offline page to a stored session.
+
+    Rows whose timestamp is already stored are skipped, so a batch sent
+    twice is only added once."""
+    from history import ConversionHistory
+    from session_store import get_store
+
+    rows = _history_rows(columns)
+    store = get_store()
+    with _SYNC_LOCKS[hash(session_id) % len(_SYNC_LOCKS)]:
+        saved = store.get(session_id) or {}
+        history = ConversionHistory.from_dict(saved["history"]) if "history" in saved else ConversionHistory()
+        seen = set(history.timestamp)
+        for timestamp, category, from_unit, to_unit, value, result, text in rows:
+            if timestamp in seen:
+                continue
+            seen.add(timestamp)
+            history.append(value, from_unit, to_unit, category, result, text, timestamp)
+        last = history.to_dict()
+        store.put(session_id, {
+            "history": last,
+            "category": saved.get("category", last["category"][-1] if len(history) else "Length"),
+            "from_unit": saved.get("from_unit", last["from_unit"][-1] if len(history) else "Meter"),
+            "to_unit": saved.get("to_unit", last["to_unit"][-1] if len(history) else "Centimeter"),
+        })
+    return len(history)
+
+
+class _OfflineHandler(SimpleHTTPRequestHandler):
+    def do_POST(self):
+        url = urlsplit(self.path)
+        session_id = parse_qs(url.query).get("sid", [""])[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        if url.path != "/history" or not session_id.isalnum() or not 0 < length <= MAX_SYNC_BYTES:
+            self.send_error(400)
+            return
+        try:
+            columns = json.loads(self.rfile.read(length))["history"]
+            sync_history(session_id, columns)
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(out_dir=DEFAULT_OUT, port=8502, host="127.0.0.1"):
+    build(out_dir)
+    handler = lambda *args, **kwargs: _OfflineHandler(*args, directory=out_dir, **kwargs)
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving the offline converter on http://{host}:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def _streamlit_session(conversions):
+    """Drive one scripted session through the app; returns (reruns, seconds)."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(APP_DIR, "unit_converter.py"), default_timeout=60)
+    reruns = 0
+    started = time.perf_counter()
+
+    def run(element):
+        nonlocal reruns
+        element.run()
+        reruns += 1
+
+    run(at)
+    categories = list(CONVERSION_FACTORS)
+    for i in range(conversions):
+        if i % 3 == 0:
+            run(at.selectbox(key="category_select").select(categories[(i // 3) % len(categories)]))
+        if i % 4 == 1:
+            run(next(b for b in at.button if b.label == "🔄 Swap Units").click())
+        run(at.number_input[0].set_value(float(i + 1)))
+        run(next(b for b in at.button if b.label == "Convert").click())
+    return reruns, time.perf_counter() - started
+
+
+def measure(conversions=10, session_seconds=120.0):
+    """Print server requests per session for the Streamlit app and the offline page.
+
+    Every widget interaction in the app is a websocket message plus a full
+    script rerun. The offline page costs one page load, and history sync
+    sends at most one request per sync interval (10 s) while there are new
+    conversions, so a session of `session_seconds` needs at most
+    ceil(session_seconds / 10) syncs, and never more than one per conversion.
+    """
+    reruns, seconds = _streamlit_session(conversions)
+    sizes = build()
+    syncs = min(conversions, math.ceil(session_seconds / 10))
+    static_requests = 1 + syncs
+    print(f"Session of {conversions} conversions (category switches, swaps, value edits):")
+    print(f"  Streamlit app: {reruns} reruns over the websocket, {seconds:.2f} s of server time")
+    print(f"  Offline page:  {static_requests} requests (1 page load of "
+          f"{sizes['index.html'] / 1024:.1f} KB, up to {syncs} history syncs), "
+          f"no server time for conversions")
+    print(f"  Saved: {reruns - static_requests} requests per session "
+          f"({(reruns - static_requests) / reruns:.0%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline build of the unit converter")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("build", "serve"):
+        command = commands.add_parser(name)
+        command.add_argument("--out", default=DEFAULT_OUT)
+    commands.choices["serve"].add_argument("--port", type=int, default=8502)
+    commands.add_parser("measure").add_argument("--conversions", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        sizes = build(args.out)
+        print("\n".join(f"{name}: {size:,} bytes" for name, size in sizes.items()))
+    elif args.command == "serve":
+        serve(args.out, args.port)
+    else:
+        measure(args.conversions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
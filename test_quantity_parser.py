@@ -0,0 +1,47 @@
+import pytest
+
+from conversion import UnknownUnit
+from quantity_parser import QuantityParseError, evaluate_expression, parse_quantity
+
+
+def test_mixed_units_add_up_in_the_first_unit():
+    value, unit = parse_quantity("5 ft 11 in")
+    assert unit == "Foot"
+    assert value == pytest.approx(5 + 11 / 12)
+
+
+def test_scientific_notation_and_bare_expressions():
+    assert parse_quantity("3.2e4 g") == (32000.0, "Gram")
+    assert parse_quantity("(100-32)*5/9") == (pytest.approx(37.7777778), None)
+
+
+def test_unknown_unit():
+    with pytest.raises(UnknownUnit):
+        parse_quantity("5 furlongs")
+
+
+def test_offset_units_do_not_add():
+    with pytest.raises(QuantityParseError):
+        parse_quantity("2 C 3 F")
+
+
+@pytest.mark.parametrize("text", ["10**400 m", "1e308*10 m"])
+def test_overflow(text):
+    with pytest.raises(QuantityParseError):
+        parse_quantity(text)
+
+
+def test_complex_result():
+    with pytest.raises(QuantityParseError, match="no real value"):
+        parse_quantity("(-8)**(1/3)")
+    with pytest.raises(QuantityParseError):
+        evaluate_expression("(-8)**0.5")
+
+
+@pytest.mark.parametrize("text", [
+    "", "3 +", "ft", "5 ft 3", "__import__('os')",
+    "1+" * 10000 + "1 m", "-" * 10000 + "1",
+])
+def test_rejected_input(text):
+    with pytest.raises(QuantityParseError):
+        parse_quantity(text)
@@ -0,0 +1,10 @@
+import numpy as np
+import pytest
+
+from registry_check import check_pair, unit_pairs
+
+
+@pytest.mark.parametrize("category, from_unit, to_unit", list(unit_pairs()))
+def test_pair(category, from_unit, to_unit):
+    rng = np.random.default_rng(0)
+    assert check_pair(rng, category, from_unit, to_unit, samples=200) == []
@@ -0,0 +1,139 @@
+# timeseries.py
+# Streaming unit conversion plus fixed-window resampling for timestamped
+# sensor series. Input is read chunk by chunk and only one partial window is
+# carried between chunks, so memory stays bounded by the chunk size no matter
+# how large the file is. Timestamps must be in ascending order.
+#
+#     python timeseries.py temps.csv out.csv --from Fahrenheit --to Celsius --window 5min
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from conversion import REGISTRY
+
+AGGREGATES = ("mean", "min", "max", "count")
+
+
+def _window_stats(window_ids, values):
+    # Window ids are sorted, so each window is one contiguous run
+    starts = np.flatnonzero(np.diff(window_ids)) + 1
+    starts = np.concatenate(([0], starts))
+    counts = np.diff(np.concatenate((starts, [len(values)])))
+    return {
+        "window": window_ids[starts],
+        "count": counts,
+        "sum": np.add.reduceat(values, starts),
+        "min": np.minimum.reduceat(values, starts),
+        "max": np.maximum.reduceat(values, starts),
+    }
+
+
+def _merge_carry(carry, stats):
+    stats["count"][0] += carry["count"]
+    stats["sum"][0] += carry["sum"]
+    stats["min"][0] = min(stats["min"][0], carry["min"])
+    stats["max"][0] = max(stats["max"][0], carry["max"])
+
+
+def _frame(stats, window_ns, aggregates):
+    frame = {"window_start": pd.to_datetime(stats["window"] * window_ns, unit="ns")}
+    for name in aggregates:
+        if name == "mean":
+            frame["mean"] = stats["sum"] / stats["count"]
+        else:
+            frame[name] = stats[name]
+    return pd.DataFrame(frame)
+
+
+def resample_convert(chunks, from_unit, to_unit, window, aggregates=("mean", "min", "max"),
+                     time_column="timestamp", value_column="value"):
+    """Convert and resample a stream of DataFrame chunks.
+
+    Yields one DataFrame of finished windows per input chunk; the last window
+    is held back until a later timestamp (or the end of input) closes it.
+    """
+    for name in aggregates:
+        if name not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {name}")
+    window_ns = pd.Timedelta(window).value
+    if window_ns <= 0:
+        raise ValueError(f"Window must be positive: {window}")
+    REGISTRY.affine(from_unit, to_unit)
+
+    carry = None
+    for chunk in chunks:
+        timestamps = pd.to_datetime(chunk[time_column]).to_numpy("datetime64[ns]").view(np.int64)
+        values = chunk[value_column].to_numpy(dtype=np.float64)
+        keep = ~np.isnan(values)
+        if not keep.all():
+            timestamps, values = timestamps[keep], values[keep]
+        if len(values) == 0:
+            continue
+
+        window_ids = timestamps // window_ns
+        if np.any(np.diff(window_ids) < 0) or (carry is not None and window_ids[0] < carry["window"]):
+            raise ValueError("Timestamps must be in ascending order")
+        values = REGISTRY.convert_array(values, from_unit, to_unit)
+
+        stats = _window_stats(window_ids, values)
+        if carry is not None:
+            if stats["window"][0] == carry["window"]:
+                _merge_carry(carry, stats)
+            else:
+                yield _frame({k: np.array([v]) for k, v in carry.items()}, window_ns, aggregates)
+        carry = {k: v[-1] for k, v in stats.items()}
+        finished = {k: v[:-1] for k, v in stats.items()}
+        if len(finished["window"]):
+            yield _frame(finished, window_ns, aggregates)
+
+    if carry is not None:
+        yield _frame({k: np.array([v]) for k, v in carry.items()}, window_ns, aggregates)
+
+
+def resample_convert_csv(source, destination, from_unit, to_unit, window,
+                         aggregates=("mean", "min", "max"), time_column="timestamp",
+                         value_column="value", chunksize=1_000_000):
+    """Stream a CSV through resample_convert into another CSV; returns rows read."""
+    rows = 0
+
+    def chunks():
+        nonlocal rows
+        reader = pd.read_csv(source, usecols=[time_column, value_column], chunksize=chunksize)
+        for chunk in reader:
+            rows += len(chunk)
+            yield chunk
+
+    header = True
+    for frame in resample_convert(chunks(), from_unit, to_unit, window, aggregates,
+                                  time_column, value_column):
+        frame.to_csv(destination, mode="w" if header else "a", header=header, index=False)
+        header = False
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and resample a timestamped CSV series")
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    parser.add_argument("--from", dest="from_unit", required=True)
+    parser.add_argument("--to", dest="to_unit", required=True)
+    parser.add_argument("--window", default="1min")
+    parser.add_argument("--aggregates", default="mean,min,max")
+    parser.add_argument("--time-column", default="timestamp")
+    parser.add_argument("--value-column", default="value")
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    rows = resample_convert_csv(
+        args.source, args.destination, args.from_unit, args.to_unit, args.window,
+        args.aggregates.split(","), args.time_column, args.value_column, args.chunksize
+    )
+    elapsed = time.perf_counter() - started
+    print(f"{rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
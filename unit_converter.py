@@ -2,13 +2,33 @@
 import streamlit as st
 import pandas as pd
 import time
-import base64
-
-# Set page configuration
-st.set_page_config(page_title="Animated Unit Converter", layout="wide")
-
-# Custom CSS with animations
-st.markdown(f"""
+import uuid
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from audit_log import get_audit_log
+from auto_units import best_unit, mixed_units
+from conversion import REGISTRY, ConversionError, convert_units
+from formatting import NOTATIONS, format_value, render_history_html
+from history import ConversionHistory
+from jobs import BULK, DONE, FINISHED, INTERACTIVE, SLICE_SIZE, get_queue
+from metrics import RERUN_DURATION, record_session
+from profiling import QUERY_PARAM, start_profiler
+from quantity_parser import parse_quantity
+from session_store import get_store
+from warmup import load_image_base64, warm_up
+
+rerun_started = time.perf_counter()
+warm_up()
+profiler = start_profiler(st.query_params.get(QUERY_PARAM))
+try:
+    profiler.section("page_config_css")
+
+    # Set page configuration
+    st.set_page_config(page_title="Animated Unit Converter", layout="wide")
+
+    # Custom CSS with animations
+    st.markdown(f"""
 <style>
 @import url('https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css');
 @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600&display=swap');
@@ -78,24 +98,36 @@ body {{
     50% {{ box-shadow: 0 0 15px #6366f1aa; }}
     100% {{ box-shadow: 0 0 5px #6366f155; }}
 }}
+
+.history-list {{
+    list-style: none;
+    padding: 0;
+    margin: 0;
+}}
+
+.history-list li {{
+    padding: 1rem;
+    margin: 0.5rem 0;
+    background: rgba(241, 245, 249, 0.5);
+    border-radius: 8px;
+}}
 </style>
 """, unsafe_allow_html=True)
 
-def img_to_base64(image_path):
-    try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except Exception as e:
-        st.sidebar.warning(f"Image not found: {str(e)}")
-        return None
-
-def developer_profile():
-    base64_img = img_to_base64("github_dp_oval.png")
-    img_src = "https://via.placeholder.com/150/6366f1/ffffff?text=IT"
-    if base64_img:
-        img_src = f"data:image/png;base64,{base64_img}"
+    def img_to_base64(image_path):
+        try:
+            return load_image_base64(image_path)
+        except Exception as e:
+            st.sidebar.warning(f"Image not found: {str(e)}")
+            return None
+
+    def developer_profile():
+        base64_img = img_to_base64("github_dp_oval.png")
+        img_src = "https://via.placeholder.com/150/6366f1/ffffff?text=IT"
+        if base64_img:
+            img_src = f"data:image/png;base64,{base64_img}"
     
-    st.sidebar.markdown(f"""
+        st.sidebar.markdown(f"""
     <div class="developer-card">
         <div style="text-align: center;">
             <img src="{img_src}" class="profile-img">
@@ -108,132 +140,242 @@ def developer_profile():
     </div>
     """, unsafe_allow_html=True)
 
-# Initialize session state
-if "history" not in st.session_state:
-    st.session_state.history = []
-if "category" not in st.session_state:
-    st.session_state.category = "Length"
-if "from_unit" not in st.session_state:
-    st.session_state.from_unit = "Meter"
-if "to_unit" not in st.session_state:
-    st.session_state.to_unit = "Centimeter"
-
-# Conversion factors
-CONVERSION_FACTORS = {
-    "Length": {
-        "Meter": 1,
-        "Centimeter": 100,
-        "Kilometer": 0.001,
-        "Inch": 39.3701,
-        "Foot": 3.28084
-    },
-    "Temperature": ["Celsius", "Fahrenheit", "Kelvin"],
-    "Weight": {
-        "Kilogram": 1,
-        "Gram": 1000,
-        "Pound": 2.20462,
-        "Ounce": 35.274
-    }
-}
-
-def convert_units(value, from_unit, to_unit, category):
-    try:
-        if from_unit == to_unit:
-            return value, "No conversion needed"
-            
-        if category == "Temperature":
-            converters = {
-                ("Celsius", "Fahrenheit"): lambda x: (x * 9/5) + 32,
-                ("Fahrenheit", "Celsius"): lambda x: (x - 32) * 5/9,
-                ("Celsius", "Kelvin"): lambda x: x + 273.15,
-                ("Kelvin", "Celsius"): lambda x: x - 273.15,
-                ("Fahrenheit", "Kelvin"): lambda x: (x - 32) * 5/9 + 273.15,
-                ("Kelvin", "Fahrenheit"): lambda x: (x - 273.15) * 9/5 + 32
-            }
-            return converters[(from_unit, to_unit)](value), "Converted"
-        else:
-            factor = (CONVERSION_FACTORS[category][to_unit] 
-                     / CONVERSION_FACTORS[category][from_unit])
-            return value * factor, f"{value} × {factor:.4f}"
-    except Exception as e:
-        return None, str(e)
-
-# Main app
-developer_profile()
-st.title("✨ Modren Unit Converter")
-
-# Category selection
-st.session_state.category = st.sidebar.selectbox(
-    "Category", 
-    list(CONVERSION_FACTORS.keys()), 
-    key="category_select"
-)
-
-# Get available units for current category
-units = list(CONVERSION_FACTORS[st.session_state.category].keys() 
-           if st.session_state.category != "Temperature" 
-           else CONVERSION_FACTORS[st.session_state.category])
-
-# Validate current units
-if st.session_state.from_unit not in units:
-    st.session_state.from_unit = units[0]
-if st.session_state.to_unit not in units:
-    st.session_state.to_unit = units[0]
-
-# Conversion UI
-col1, col2, col3 = st.columns([3, 1, 3])
-with col1:
-    from_unit = st.selectbox(
-        "From", 
-        units, 
-        index=units.index(st.session_state.from_unit),
-        key="from_unit_select"
+    # Initialize session state
+    profiler.section("session_state")
+    store = get_store()
+    if "session_key" not in st.session_state:
+        # Shared storage lets any replica resume a session from its ?sid= key
+        st.session_state.session_key = st.query_params.get("sid") or uuid.uuid4().hex
+        st.query_params["sid"] = st.session_state.session_key
+        saved = store.get(st.session_state.session_key)
+        if saved:
+            st.session_state.history = ConversionHistory.from_dict(saved["history"])
+            st.session_state.category = st.session_state.category_select = saved["category"]
+            st.session_state.from_unit = saved["from_unit"]
+            st.session_state.to_unit = saved["to_unit"]
+    if "history" not in st.session_state:
+        st.session_state.history = ConversionHistory()
+    if "category" not in st.session_state:
+        st.session_state.category = "Length"
+    if "from_unit" not in st.session_state:
+        st.session_state.from_unit = "Meter"
+    if "to_unit" not in st.session_state:
+        st.session_state.to_unit = "Centimeter"
+
+    # Main app
+    profiler.section("developer_profile")
+    developer_profile()
+    st.title("✨ Modren Unit Converter")
+
+    # Category selection
+    profiler.section("sidebar_widgets")
+    st.session_state.category = st.sidebar.selectbox(
+        "Category", 
+        REGISTRY.categories, 
+        key="category_select"
     )
 
-with col2:
-    st.markdown("<div style='height: 100px; display: flex; align-items: center; justify-content: center;'>➔</div>", 
-              unsafe_allow_html=True)
-    if st.button("🔄 Swap Units"):
-        st.session_state.from_unit, st.session_state.to_unit = st.session_state.to_unit, st.session_state.from_unit
-        st.rerun()  # Corrected line
-
-with col3:
-    to_unit = st.selectbox(
-        "To", 
-        units, 
-        index=units.index(st.session_state.to_unit),
-        key="to_unit_select"
-    )
-    value = st.number_input("Value", value=1.0, min_value=0.0, step=0.1)
-
-# Update session state
-st.session_state.from_unit = from_unit
-st.session_state.to_unit = to_unit
-
-# Conversion
-if st.button("Convert", type="primary"):
-    with st.spinner("Converting..."):
-        time.sleep(0.5)
-        converted, formula = convert_units(value, from_unit, to_unit, st.session_state.category)
-        if converted is not None:
-            result = f"{value} {from_unit} = {converted:.4f} {to_unit}"
-            st.session_state.history.append(result)
-            st.markdown(f"""
+    # Result formatting
+    precision = st.sidebar.slider("Precision", 0, 10, 4)
+    notation = st.sidebar.selectbox("Notation", NOTATIONS, format_func=str.capitalize)
+    auto_unit = st.sidebar.checkbox("Auto-pick readable unit", help="Show the result in the most readable unit of the To unit's system")
+
+    # Unit options for the current category, precomputed by the registry
+    profiler.section("unit_options")
+    units = REGISTRY.category_units[st.session_state.category]
+    unit_ids = REGISTRY.category_ids[st.session_state.category]
+
+    # Validate current units
+    if REGISTRY.unit_category.get(st.session_state.from_unit) != st.session_state.category:
+        st.session_state.from_unit = units[0]
+    if REGISTRY.unit_category.get(st.session_state.to_unit) != st.session_state.category:
+        st.session_state.to_unit = units[0]
+
+    # Conversion UI
+    profiler.section("conversion_widgets")
+    col1, col2, col3 = st.columns([3, 1, 3])
+    with col1:
+        from_unit = REGISTRY.unit_names[st.selectbox(
+            "From", 
+            unit_ids, 
+            index=REGISTRY.unit_index[st.session_state.from_unit],
+            format_func=REGISTRY.unit_names.__getitem__,
+            key="from_unit_select"
+        )]
+
+    with col2:
+        st.markdown("<div style='height: 100px; display: flex; align-items: center; justify-content: center;'>➔</div>", 
+                  unsafe_allow_html=True)
+        if st.button("🔄 Swap Units"):
+            st.session_state.from_unit, st.session_state.to_unit = st.session_state.to_unit, st.session_state.from_unit
+            st.rerun()  # Corrected line
+
+    with col3:
+        to_unit = REGISTRY.unit_names[st.selectbox(
+            "To", 
+            unit_ids, 
+            index=REGISTRY.unit_index[st.session_state.to_unit],
+            format_func=REGISTRY.unit_names.__getitem__,
+            key="to_unit_select"
+        )]
+        value = st.number_input("Value", value=1.0, step=0.1)
+        expression = st.text_input("Or type a quantity", placeholder="5 ft 11 in, 3.2e4 g, (100-32)*5/9")
+
+    # Update session state
+    st.session_state.from_unit = from_unit
+    st.session_state.to_unit = to_unit
+
+    # A typed quantity overrides the Value box, and the From unit when it names one
+    input_error = None
+    value_label = f"{value} {from_unit}"
+    try:
+        if expression.strip():
+            value, typed_unit = parse_quantity(expression)
+            if typed_unit is not None:
+                if REGISTRY.unit_category.get(typed_unit) != st.session_state.category:
+                    raise ConversionError(f"{typed_unit} is not a {st.session_state.category} unit")
+                from_unit = typed_unit
+            value_label = expression.strip() if typed_unit else f"{value} {from_unit}"
+        # Negative temperatures are fine; below absolute zero or negative lengths are not
+        REGISTRY.check([value], from_unit)
+    except ConversionError as e:
+        input_error = str(e)
+
+    # Conversion
+    profiler.section("conversion")
+    if st.button("Convert", type="primary"):
+        with st.spinner("Converting..."):
+            with profiler.span("sleep"):
+                time.sleep(0.5)
+            if input_error:
+                converted, formula = None, input_error
+            else:
+                converted, formula = convert_units(value, from_unit, to_unit, st.session_state.category)
+            if converted is not None:
+                audit = get_audit_log()
+                if audit is not None:
+                    audit.record(value, from_unit, to_unit, converted)
+                if auto_unit:
+                    converted, to_unit = best_unit(converted, to_unit)
+                    mixed = mixed_units(converted, to_unit)
+                    if mixed:
+                        formula = f"{formula} ({mixed})"
+                result = f"{value_label} = {format_value(converted, precision, notation)} {to_unit}"
+                st.session_state.history.append(value, from_unit, to_unit, st.session_state.category,
+                                                converted, result)
+                st.markdown(f"""
             <div class="result-card">
                 <h3 style="color: #1e293b;">{result}</h3>
                 <p style="color: #475569;">Formula: {formula}</p>
             </div>
             """, unsafe_allow_html=True)
-        else:
-            st.error(f"Error: {formula}")
-
-# History
-with st.expander("📜 Conversion History"):
-    for entry in reversed(st.session_state.history):
-        st.markdown(f"<div style='padding: 1rem; margin: 0.5rem 0; background: rgba(241, 245, 249, 0.5); border-radius: 8px;'>{entry}</div>", 
-                  unsafe_allow_html=True)
-    if st.button("Clear History"):
-        st.session_state.history = []# # unit_converter.py
+            else:
+                st.error(f"Error: {formula}")
+
+    # History
+    profiler.section("history")
+    with st.expander("📜 Conversion History"):
+        st.markdown(render_history_html(st.session_state.history.text), unsafe_allow_html=True)
+        if st.button("Clear History"):
+            st.session_state.history = ConversionHistory()
+
+    # History analytics, read from aggregates maintained on append
+    history = st.session_state.history
+    if len(history):
+        with st.expander("📊 History Analytics"):
+            st.markdown("**Most frequent conversions**")
+            st.bar_chart(history.top_pairs(), x="Pair", y="Conversions")
+            st.markdown("**Conversions over time**")
+            st.line_chart(history.over_time())
+            st.markdown("**Values per category**, converted to each category's base unit")
+            st.dataframe(history.category_summary(), hide_index=True, width="stretch")
+            category = st.selectbox("Distribution for", list(history.category_stats), key="analytics_category")
+            st.caption(f"Input magnitudes in {REGISTRY.base_units[category]}")
+            st.bar_chart(history.value_distribution(category))
+
+    # Bulk conversion: uploads are parsed and converted by the background job
+    # queue, so a large file never blocks this script thread
+    profiler.section("bulk_jobs")
+    job_queue = get_queue()
+    session_jobs = job_queue.jobs(st.session_state.session_key)
+    jobs_active = any(job.status not in FINISHED for job in session_jobs)
+
+    @st.fragment(run_every=1 if jobs_active else None)
+    def bulk_job_list():
+        still_active = False
+        for job in job_queue.jobs(st.session_state.session_key):
+            label = f"{job.from_unit} → {job.to_unit}" + (f", {job.total:,} values" if job.total else "")
+            status_col, action_col = st.columns([4, 1])
+            if job.status not in FINISHED:
+                still_active = True
+                status_col.progress(job.progress, text=f"{label}: {job.status} ({job.progress:.0%})")
+                action_col.button("Cancel", key=f"cancel_{job.id}", on_click=job_queue.cancel, args=(job.id,))
+            elif job.status == DONE:
+                status_col.success(f"{label}: done in {job.finished - job.submitted:.1f} s")
+                action_col.download_button("Download", job.to_csv, file_name=f"converted_{job.to_unit.lower()}.csv",
+                                           mime="text/csv", key=f"download_{job.id}", on_click="ignore")
+                action_col.button("Dismiss", key=f"dismiss_{job.id}", on_click=job_queue.forget, args=(job.id,))
+            else:
+                status_col.warning(f"{label}: {job.error or job.status}")
+                action_col.button("Dismiss", key=f"dismiss_{job.id}", on_click=job_queue.forget, args=(job.id,))
+        if jobs_active and not still_active:
+            # Stop polling once everything has finished
+            st.rerun()
+
+    with st.expander("📦 Bulk Conversion", expanded=jobs_active):
+        upload = st.file_uploader("CSV file", type=["csv"], key="bulk_file")
+        if upload is not None:
+            try:
+                columns = list(pd.read_csv(upload, nrows=0).columns)
+            except (ValueError, UnicodeDecodeError) as e:
+                st.error(f"Cannot read {upload.name}: {e}")
+                columns = []
+            if columns:
+                column = st.selectbox("Column to convert", columns, key="bulk_column")
+                if st.button(f"Queue conversion {from_unit} → {to_unit}"):
+                    # Files of at most one slice of rows go ahead of bulk work from other sessions
+                    data = upload.getvalue()
+                    priority = INTERACTIVE if data.count(b"\n") <= SLICE_SIZE else BULK
+                    job_queue.submit_csv(data, column, from_unit, to_unit,
+                                         owner=st.session_state.session_key, priority=priority)
+                    st.rerun()
+        bulk_job_list()
+
+    # Save shared session state (write-behind, only when something changed)
+    saved_state = (
+        st.session_state.category, st.session_state.from_unit, st.session_state.to_unit,
+        id(st.session_state.history), len(st.session_state.history)
+    )
+    if st.session_state.get("saved_state") != saved_state:
+        st.session_state.saved_state = saved_state
+        store.put(st.session_state.session_key, {
+            "history": st.session_state.history.to_dict(),
+            "category": st.session_state.category,
+            "from_unit": st.session_state.from_unit,
+            "to_unit": st.session_state.to_unit,
+        })
+
+    # Metrics
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        record_session(ctx.session_id, len(st.session_state.history))
+    RERUN_DURATION.observe(time.perf_counter() - rerun_started)
+finally:
+    # st.rerun() leaves the script early; the cProfile profiler must still stop
+    profiler.finish()
+
+# Profiling panel
+if profiler.enabled:
+    with st.expander("⏱️ Rerun Profile", expanded=True):
+        st.caption(f"Total rerun time: {profiler.total * 1000:.1f} ms")
+        st.dataframe(pd.DataFrame(profiler.breakdown()), hide_index=True, width="stretch")
+        if profiler.profile is not None:
+            # Built only when clicked: folding a large profile takes a while
+            st.download_button("Download flame graph (folded stacks)", profiler.folded_stacks,
+                               file_name="unit_converter.folded", mime="text/plain")
+            st.download_button("Download cProfile stats", profiler.pstats_bytes,
+                               file_name="unit_converter.prof", mime="application/octet-stream")
+# # unit_converter.py
 # import streamlit as st
 # import pandas as pd
 # import base64
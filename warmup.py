@@ -0,0 +1,113 @@
+# warmup.py
+# Warm-up of everything a first rerun would otherwise pay for: heavy imports,
+# the compiled registry and its pair cache, formatting, and the base64-encoded
+# profile image. Launch the app through this module to warm up before the
+# server starts listening:
+#
+#     python warmup.py [streamlit options]
+#
+# When started with plain `streamlit run unit_converter.py` the first rerun
+# performs the warm-up instead. READY is set once it has finished; the
+# metrics endpoint reports it on /ready.
+import base64
+import os
+import sys
+import threading
+import time
+from functools import lru_cache
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_SCRIPT = os.path.join(APP_DIR, "unit_converter.py")
+PROFILE_IMAGE = "github_dp_oval.png"
+
+READY = threading.Event()
+timings = {}
+
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def load_image_base64(image_path):
+    if not os.path.isabs(image_path):
+        image_path = os.path.join(APP_DIR, image_path)
+    with open(image_path, "rb") as img_file:
+        return base64.b64encode(img_file.read()).decode()
+
+
+def _step(name, func):
+    started = time.perf_counter()
+    func()
+    timings[name] = time.perf_counter() - started
+
+
+def _prime_registry():
+    from conversion import REGISTRY
+    for from_unit in REGISTRY.unit_names:
+        for to_unit in REGISTRY.unit_names:
+            if REGISTRY.unit_category[from_unit] == REGISTRY.unit_category[to_unit]:
+                REGISTRY.affine(from_unit, to_unit)
+
+
+def _prime_kernels():
+    # Compiles the mixed-pair kernel when numba is installed
+    from conversion import REGISTRY
+    REGISTRY.convert_mixed([1.0], [0], [0])
+
+
+def _prime_formatting():
+    from formatting import NOTATIONS, format_value, render_history_html
+    for notation in NOTATIONS:
+        format_value(1.0, 4, notation)
+    render_history_html(["1.0 Meter = 100.0000 Centimeter"])
+
+
+def _prime_modules():
+    import history  # noqa: F401 (pandas and the analytics helpers)
+    import session_store
+    session_store.get_store()
+
+
+def _prime_assets():
+    try:
+        load_image_base64(PROFILE_IMAGE)
+    except OSError:
+        # The app shows its own warning and falls back to a placeholder
+        pass
+
+
+def _start_metrics():
+    import metrics
+    metrics.start_server()
+
+
+def warm_up():
+    """Run the warm-up once per process; returns seconds spent per step."""
+    with _lock:
+        if not READY.is_set():
+            _step("registry", _prime_registry)
+            _step("kernels", _prime_kernels)
+            _step("formatting", _prime_formatting)
+            _step("modules", _prime_modules)
+            _step("assets", _prime_assets)
+            _step("metrics", _start_metrics)
+            READY.set()
+    return dict(timings)
+
+
+def main():
+    from streamlit.web import cli
+
+    # Run as a script this file is __main__, while the app and /ready import
+    # `warmup`: warm that module so its READY and image cache are the ones used
+    import warmup
+
+    started = time.perf_counter()
+    warmup.warm_up()
+    print(f"Warm-up finished in {(time.perf_counter() - started) * 1000:.0f} ms: "
+          + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in warmup.timings.items()))
+    sys.argv = ["streamlit", "run", APP_SCRIPT, *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()